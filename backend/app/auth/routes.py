@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt
 
-from ..database import SessionLocal
+from ..database import get_async_db
 from ..models import User
 from ..schemas import UserCreate, UserLogin
-from .utils import hash_password, verify_password, create_access_token
-from ..config import SECRET_KEY, ALGORITHM
+from .utils import create_access_token, password_hasher, PasswordHasherBusy
+from ..cache import TTLCache
+from ..config import SECRET_KEY, ALGORITHM, PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE
 
 router = APIRouter(prefix="/auth")
 
@@ -15,22 +17,29 @@ router = APIRouter(prefix="/auth")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
-# ------------------------
-# Database Dependency
-# ------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def user_by_email_query(normalized_email: str):
+    """Case-insensitive user lookup; served by the lower(email) index"""
+    return select(User).where(func.lower(User.email) == normalized_email)
+
+
+async def _find_user_by_email(db: AsyncSession, normalized_email: str):
+    result = await db.execute(user_by_email_query(normalized_email))
+    return result.scalars().first()
+
+
+def _busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please try again shortly.",
+        headers={"Retry-After": "1"}
+    )
 
 
 # ------------------------
 # Register
 # ------------------------
 @router.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
         # Validate input
         if not user.full_name or not user.full_name.strip():
@@ -48,15 +57,9 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         if not user.password or len(user.password) < 6:
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
         
-        # Check if user already exists (case-insensitive)
-        # SQLite compatible: check all users and compare case-insensitively
+        # Check if user already exists (case-insensitive, uses ix_users_email_lower)
         try:
-            all_users = db.query(User).all()
-            existing_user = None
-            for u in all_users:
-                if u.email and u.email.lower().strip() == normalized_email:
-                    existing_user = u
-                    break
+            existing_user = await _find_user_by_email(db, normalized_email)
         except Exception as db_error:
             print(f"Database query error: {db_error}")
             raise HTTPException(status_code=500, detail=f"Database error: {str(db_error)}")
@@ -67,9 +70,11 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
                 detail=f"Email '{normalized_email}' is already registered. Please use a different email or try logging in."
             )
 
-        # Hash password
+        # Hash password (on the dedicated bcrypt pool)
         try:
-            hashed_password = hash_password(user.password)
+            hashed_password = await password_hasher.hash(user.password)
+        except PasswordHasherBusy:
+            raise _busy_error()
         except Exception as hash_error:
             print(f"Password hashing error: {hash_error}")
             raise HTTPException(status_code=500, detail="Error processing password")
@@ -83,10 +88,10 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             )
 
             db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
+            await db.commit()
+            await db.refresh(new_user)
         except Exception as db_error:
-            db.rollback()
+            await db.rollback()
             print(f"Database commit error: {db_error}")
             # Check if it's a unique constraint violation
             if "UNIQUE constraint" in str(db_error) or "unique constraint" in str(db_error).lower():
@@ -108,7 +113,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         # Re-raise HTTP exceptions as-is
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         # Log the actual error for debugging
         import traceback
         error_details = str(e)
@@ -125,7 +130,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 # Login
 # ------------------------
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     try:
         # Normalize email: lowercase and strip whitespace
         normalized_email = user.email.lower().strip()
@@ -136,13 +141,8 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         if not user.password:
             raise HTTPException(status_code=400, detail="Password cannot be empty")
         
-        # Find user (case-insensitive email search - SQLite compatible)
-        all_users = db.query(User).all()
-        db_user = None
-        for u in all_users:
-            if u.email.lower().strip() == normalized_email:
-                db_user = u
-                break
+        # Find user (case-insensitive, single indexed lookup)
+        db_user = await _find_user_by_email(db, normalized_email)
 
         if not db_user:
             raise HTTPException(
@@ -150,12 +150,22 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
                 detail="Invalid email or password. Please check your credentials and try again."
             )
 
-        # Verify password
-        if not verify_password(user.password, db_user.password):
+        # Verify password (on the dedicated bcrypt pool)
+        try:
+            password_ok, new_hash = await password_hasher.verify(user.password, db_user.password)
+        except PasswordHasherBusy:
+            raise _busy_error()
+        
+        if not password_ok:
             raise HTTPException(
                 status_code=401, 
                 detail="Invalid email or password. Please check your credentials and try again."
             )
+        
+        # Stored hash was made under an older cost policy: replace it transparently
+        if new_hash:
+            db_user.password = new_hash
+            await db.commit()
 
         # Create access token
         try:
@@ -190,31 +200,57 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
         )
 
 
+# ------------------------
+# Principal cache
+# ------------------------
+# Resolved users keyed by token, so protected requests skip the users lookup.
+# Cached instances are detached from their session and must be treated as read-only.
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop every cached principal for a user"""
+    principal_cache.discard_where(lambda token, cached_user: cached_user.id == user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+
 # ------------------------
 # Get Current User (JWT Protected)
 # ------------------------
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        # Decode the JWT token
+        # Decode the JWT token (always: this also enforces expiry)
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("user_id")
 
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = db.query(User).filter(User.id == user_id).first()
+        user = principal_cache.get(token)
+        if user is not None and user.id == user_id:
+            return user
+
+        user = await db.get(User, user_id)
 
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
 
+        # Detach so later commits in this session cannot expire the cached copy
+        db.expunge(user)
+        principal_cache.set(token, user)
         return user
 
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
+    except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
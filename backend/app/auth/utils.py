@@ -1,9 +1,63 @@
+import time
+from functools import lru_cache
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
-from ..config import SECRET_KEY, ALGORITHM
+from ..config import (
+    SECRET_KEY,
+    ALGORITHM,
+    BCRYPT_ROUNDS,
+    BCRYPT_TARGET_MS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_QUEUE,
+)
+from ..worker_pool import WorkerPool, WorkerPoolBusy
+
+# bcrypt's own minimum is 4; never auto-calibrate below a sane floor
+MIN_AUTO_ROUNDS = 10
+MAX_AUTO_ROUNDS = 15
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    # Pinning min/max to the policy makes needs_update() flag any hash made
+    # with a different cost, so logins can transparently rehash it.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+    """Pick the largest cost whose hash time stays under target_ms on this machine"""
+    probe_rounds = MIN_AUTO_ROUNDS
+    start = time.perf_counter()
+    _context(probe_rounds).hash("calibration-password")
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    rounds = probe_rounds
+    # Each extra round doubles the work
+    while rounds < MAX_AUTO_ROUNDS and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    return rounds
+
+
+def _resolve_rounds() -> int:
+    if BCRYPT_ROUNDS == "auto":
+        return calibrate_bcrypt_rounds(BCRYPT_TARGET_MS)
+    return int(BCRYPT_ROUNDS)
+
+
+bcrypt_rounds = _resolve_rounds()
+pwd_context = _context(bcrypt_rounds)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str):
     return pwd_context.hash(password)
@@ -16,3 +70,69 @@ def create_access_token(data: dict, expires_minutes=120):
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
     payload.update({"exp": expire})
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+# ------------------------
+# Worker-pool password hashing (see app/worker_pool.py)
+# ------------------------
+
+def _pool_warmup() -> None:
+    """Start a worker (and its passlib/bcrypt imports) ahead of the first login"""
+
+
+def _pool_hash(password: str, rounds: int):
+    started = time.time()
+    result = _context(rounds).hash(password)
+    return result, started, time.time()
+
+
+def _pool_verify(plain: str, hashed: str, rounds: int):
+    started = time.time()
+    result = _context(rounds).verify_and_update(plain, hashed)
+    return result, started, time.time()
+
+
+class PasswordHasherBusy(WorkerPoolBusy):
+    """Raised when the password work queue is full"""
+
+
+class PasswordHasher(WorkerPool):
+    """
+    Runs bcrypt on a dedicated, size-limited pool so login bursts cannot
+    tie up the threadpool that serves the sync routes.
+    """
+
+    name = "bcrypt"
+    busy_error = PasswordHasherBusy
+    busy_message = "Too many concurrent password operations"
+    warmup = staticmethod(_pool_warmup)
+
+    def __init__(self, workers: int, kind: str, max_queue: int, rounds: int):
+        super().__init__(workers, kind, max_queue)
+        self.rounds = rounds
+        self.rehashed = 0
+
+    async def hash(self, password: str) -> str:
+        result, _, _ = await self.submit(_pool_hash, password, self.rounds)
+        return result
+
+    async def verify(self, plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password. The second value is a new hash when the stored one
+        was made under a different cost policy and should be replaced.
+        """
+        (ok, new_hash), _, _ = await self.submit(_pool_verify, plain, hashed, self.rounds)
+        if new_hash:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> dict:
+        return {**super().stats(), "bcrypt_rounds": self.rounds, "rehashed": self.rehashed}
+
+
+password_hasher = PasswordHasher(
+    workers=PASSWORD_HASH_WORKERS,
+    kind=PASSWORD_HASH_EXECUTOR,
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+    rounds=bcrypt_rounds,
+)
@@ -21,3 +21,133 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Support both JWT_SECRET and SECRET_KEY for compatibility
 SECRET_KEY = os.getenv("JWT_SECRET") or os.getenv("SECRET_KEY", "9a93535b8efd8813b0b819116cc827ea8c00ebed43caef498dfcece7895533b7")
 ALGORITHM = os.getenv("JWT_ALGO", "HS256")
+
+# Maximum number of sections generated concurrently for one document
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "8"))
+# Batched mode: ask for several sections in one JSON completion instead of one call per section
+GENERATION_BATCH_ENABLED = os.getenv("GENERATION_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+GENERATION_BATCH_MAX_SECTIONS = int(os.getenv("GENERATION_BATCH_MAX_SECTIONS", "12"))
+# Speculative mode: start generating the first sections as soon as an AI outline is saved
+SPECULATIVE_GENERATION_ENABLED = os.getenv("SPECULATIVE_GENERATION_ENABLED", "false").lower() in ("1", "true", "yes")
+SPECULATIVE_SECTIONS = int(os.getenv("SPECULATIVE_SECTIONS", "3"))
+SPECULATIVE_TTL = float(os.getenv("SPECULATIVE_TTL", "600"))  # seconds staged work is kept unclaimed
+
+# LLM backend: "openrouter" calls the OpenRouter API; "local" answers in-process with
+# deterministic text (no API key or network), for development and load testing
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openrouter").strip().lower()
+LOCAL_LLM_LATENCY = float(os.getenv("LOCAL_LLM_LATENCY", "0"))  # seconds per simulated completion
+
+# OpenRouter HTTP client
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", "60"))  # write/pool phases
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "5"))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", "45"))  # max gap between bytes
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+OPENROUTER_MAX_KEEPALIVE = int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "10"))
+OPENROUTER_HTTP2 = os.getenv("OPENROUTER_HTTP2", "true").lower() in ("1", "true", "yes")
+OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-flash-1.5")  # FREE model via OpenRouter
+# Ordered model list for routing: the first is the primary, the next ones serve hedged requests.
+# Defaults to OPENROUTER_MODEL alone (no hedging).
+OPENROUTER_MODELS = [
+    m.strip() for m in os.getenv("OPENROUTER_MODELS", OPENROUTER_MODEL).split(",") if m.strip()
+] or [OPENROUTER_MODEL]
+# Model limits in tokens, used to size batched prompts.
+# LLM_CONTEXT_WINDOWS overrides the context window per model: "model=tokens,model=tokens"
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "32768"))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "8192"))
+# Prompts that leave less room than this for the answer are rejected (413)
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "256"))
+# Token budget for section text in regenerate/refine prompts, per doc_type (longer: trimmed when
+# regenerating, refined in parts)
+PROMPT_CONTEXT_BUDGETS = {
+    "docx": int(os.getenv("PROMPT_BUDGET_DOCX", "2000")),
+    "pptx": int(os.getenv("PROMPT_BUDGET_PPTX", "800")),
+}
+LLM_CONTEXT_WINDOWS = {
+    model.strip(): int(tokens)
+    for model, _, tokens in (
+        item.partition("=") for item in os.getenv("LLM_CONTEXT_WINDOWS", "").split(",") if "=" in item
+    )
+}
+
+# LLM prompt/response cache (in-process LRU in front of an on-disk SQLite store)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(BACKEND_DIR / "llm_cache.db")))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Password hashing: bcrypt cost ("auto" measures one to fit BCRYPT_TARGET_MS)
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS", "12")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+# Dedicated executor for bcrypt: "thread" or "process"
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+# Authenticated principal cache used by get_current_user
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))  # seconds
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+# Database engine profile: "production" applies the SQLite tuning below, "default" leaves SQLite stock
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, i.e. 64 MiB
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+
+# Background generation jobs: number of jobs processed at the same time
+GENERATION_JOB_WORKERS = int(os.getenv("GENERATION_JOB_WORKERS", "2"))
+# A job hit by a provider outage (503) is queued again after Retry-After, or after
+# GENERATION_JOB_RETRY_DELAY seconds doubling per retry, up to GENERATION_JOB_MAX_RETRIES times
+GENERATION_JOB_RETRY_DELAY = float(os.getenv("GENERATION_JOB_RETRY_DELAY", "15"))
+GENERATION_JOB_MAX_RETRIES = int(os.getenv("GENERATION_JOB_MAX_RETRIES", "5"))
+
+# Global limit on concurrent upstream LLM calls (shared by all users and priority classes)
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+
+# Idempotency-Key replay store for generate/refine endpoints
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))  # seconds
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+# A request still marked in progress after this long is assumed dead and may be retried
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "300"))  # seconds
+
+# Upstream LLM resilience: total attempts per call, backoff bounds (seconds) and circuit breaker
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures that open it
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # seconds before a probe is let through
+
+# Hedged requests: when the primary model is slower than its own latency percentile,
+# send the same prompt to the next model and keep whichever answers first
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "90"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # below this, use the default delay
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "10"))  # seconds
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "500"))  # recent calls kept per model
+
+# Document export: rendered files stay in memory up to EXPORT_SPOOL_MAX_BYTES and spill
+# to an anonymous temporary file beyond that; responses stream in EXPORT_CHUNK_SIZE pieces
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv("EXPORT_SPOOL_MAX_BYTES", str(16 * 1024 * 1024)))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", str(64 * 1024)))
+# Export rendering runs off the event loop on a dedicated pool: "process" (scales across cores)
+# or "thread"; up to EXPORT_MAX_QUEUE exports wait beyond the busy workers before 503s
+EXPORT_EXECUTOR = os.getenv("EXPORT_EXECUTOR", "process")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXPORT_MAX_QUEUE = int(os.getenv("EXPORT_MAX_QUEUE", "32"))
+# Rendered export cache: content-addressed files on disk, LRU-evicted beyond EXPORT_CACHE_MAX_BYTES
+EXPORT_CACHE_ENABLED = os.getenv("EXPORT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EXPORT_CACHE_DIR = Path(os.getenv("EXPORT_CACHE_DIR", str(BACKEND_DIR / "export_cache")))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Pre-rendered docx section fragments kept for incremental exports (bytes, 0 disables)
+EXPORT_FRAGMENT_CACHE_BYTES = int(os.getenv("EXPORT_FRAGMENT_CACHE_BYTES", str(64 * 1024 * 1024)))
+# Bulk ZIP export: projects loaded and rendered at once; each holds its file until it is written out
+EXPORT_BULK_CONCURRENCY = int(os.getenv("EXPORT_BULK_CONCURRENCY", str(EXPORT_WORKERS)))
+# Most projects one bulk export request may list (larger requests get a 400)
+EXPORT_BULK_MAX_PROJECTS = int(os.getenv("EXPORT_BULK_MAX_PROJECTS", "500"))
@@ -1,7 +1,24 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from contextvars import ContextVar
 from pathlib import Path
-import os
+from typing import Optional
+import time
+
+from .config import (
+    DB_PROFILE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_TEMP_STORE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+)
 
 # Get the backend directory
 BACKEND_DIR = Path(__file__).parent.parent
@@ -11,17 +28,165 @@ DATABASE_PATH = BACKEND_DIR / "database.db"
 # Convert to string and replace backslashes for SQLite
 db_path_str = str(DATABASE_PATH.absolute()).replace("\\", "/")
 DATABASE_URL = f"sqlite:///{db_path_str}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{db_path_str}"
 
 # Export DATABASE_PATH for use in scripts
-__all__ = ['engine', 'SessionLocal', 'Base', 'DATABASE_PATH', 'DATABASE_URL']
+__all__ = ['engine', 'SessionLocal', 'Base', 'DATABASE_PATH', 'DATABASE_URL', 'get_db', 'start_request_stats', 'create_sqlite_engine',
+           'async_engine', 'AsyncSessionLocal', 'ASYNC_DATABASE_URL', 'get_async_db']
 
-# Create engine with proper configuration
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    echo=False  # Set to True for SQL query logging
-)
+
+def sqlite_pragmas(profile: str) -> dict:
+    """PRAGMAs applied to every new SQLite connection for an engine profile"""
+    if profile != "production":
+        return {}
+    return {
+        # WAL lets readers run alongside a writer; NORMAL sync is safe with WAL
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        # Wait for a lock instead of failing with "database is locked"
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "cache_size": SQLITE_CACHE_SIZE,
+        "temp_store": SQLITE_TEMP_STORE,
+    }
+
+
+def _engine_args(profile: str, pool_class) -> tuple:
+    connect_args = {"check_same_thread": False}
+    pool_args = {}
+    if profile == "production":
+        connect_args["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000
+        pool_args = {
+            "poolclass": pool_class,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    return connect_args, pool_args
+
+
+def _install_pragmas(sync_engine, profile: str) -> None:
+    pragmas = sqlite_pragmas(profile)
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_sqlite_engine(url: str, profile: str = DB_PROFILE):
+    """Create an engine for a SQLite file using the given tuning profile"""
+    connect_args, pool_args = _engine_args(profile, QueuePool)
+    new_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        echo=False,  # Set to True for SQL query logging
+        **pool_args
+    )
+    _install_pragmas(new_engine, profile)
+    return new_engine
+
+
+def create_async_sqlite_engine(url: str, profile: str = DB_PROFILE):
+    """Create an aiosqlite engine for a SQLite file using the given tuning profile"""
+    connect_args, pool_args = _engine_args(profile, AsyncAdaptedQueuePool)
+    new_engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        echo=False,
+        **pool_args
+    )
+    _install_pragmas(new_engine.sync_engine, profile)
+    return new_engine
+
+
+# Create engine with proper configuration (sync: scripts, startup, health check)
+engine = create_sqlite_engine(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API routes so DB I/O does not block the event loop
+async_engine = create_async_sqlite_engine(ASYNC_DATABASE_URL)
+
+# expire_on_commit=False: attributes stay loaded after commit (no implicit async lazy-loads)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
+
+
+# ------------------------
+# Per-request DB instrumentation
+# ------------------------
+class RequestDBStats:
+    """Sessions opened, queries run and time spent waiting for a connection during one request"""
+
+    def __init__(self):
+        self.sessions = 0
+        self.queries = 0
+        self.checkout_ms = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestDBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def start_request_stats() -> RequestDBStats:
+    """Begin collecting DB stats for the current request (called by middleware)"""
+    stats = RequestDBStats()
+    _request_stats.set(stats)
+    return stats
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+
+
+event.listen(engine, "before_cursor_execute", _count_query)
+event.listen(async_engine.sync_engine, "before_cursor_execute", _count_query)
+
+
+@event.listens_for(Session, "after_transaction_create")
+def _mark_checkout_start(session, transaction):
+    # The root transaction is created just before a connection is acquired
+    if transaction.parent is None:
+        session.info["checkout_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_begin")
+def _record_checkout(session, transaction, connection):
+    started = session.info.pop("checkout_started", None)
+    stats = _request_stats.get()
+    if started is not None and stats is not None:
+        stats.checkout_ms += (time.perf_counter() - started) * 1000
+
+
+# ------------------------
+# Database Dependency
+# ------------------------
+def get_db():
+    """
+    One session per request. FastAPI caches dependencies per request, so
+    get_current_user and the route handler share this session.
+    """
+    db = SessionLocal()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sessions += 1
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Async counterpart of get_db: one AsyncSession per request"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sessions += 1
+    async with AsyncSessionLocal() as db:
+        yield db
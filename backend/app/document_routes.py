@@ -1,274 +1,456 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import Dict, Any
-import os
-import tempfile
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Any, AsyncIterator, Optional
+import copy
+import json
 from datetime import datetime
 
-from .database import SessionLocal
-from .models import Project, Content, Refinement, User
+from .config import EXPORT_BULK_MAX_PROJECTS
+from .database import AsyncSessionLocal, get_async_db
+from .models import Project, Content, Refinement, User, GenerationJob
 from .schemas import (
     GenerateContentRequest,
     RefineContentRequest,
     FeedbackRequest,
-    AIGenerateOutlineRequest
+    AIGenerateOutlineRequest,
+    BulkExportRequest
 )
 from .auth.routes import get_current_user
-from .services.gemini_service import generate_content, refine_content, generate_outline
-from docx import Document
-from pptx import Presentation
-from pptx.util import Pt
+from .projects_routes import get_user_project
+from .idempotency import idempotent_request
+from .services.gemini_service import (
+    generate_content,
+    refine_content,
+    generate_outline,
+    stream_content,
+    stream_refinement
+)
+from .services.generation import generate_sections, store_generated_sections
+from .services.jobs import job_runner, job_status
+from .services.scheduler import llm_request_context, INTERACTIVE, BULK
+from .services.resilience import LLMServiceError
+from .services.speculation import speculator, project_outline_version
+from .services.exporter import export_snapshot, export_filename, export_response, content_disposition, ExportBusy
+from .services.export_cache import cached_render, export_key, etag_for, etag_matches
+from .services.bulk_export import stream_bulk_export
 
 router = APIRouter(prefix="/projects", tags=["Documents"])
 
 
-def get_db():
-    db = SessionLocal()
+def _find_section(project: Project, section_id: str):
+    """Find an outline item by id (or by its title-derived key)"""
+    for item in project.outline or []:
+        if item.get("id") == section_id or item.get("title", "").lower().replace(" ", "_") == section_id:
+            return item
+    return None
+
+
+async def _save_section_content(db: AsyncSession, project: Project, section_id: str, section_title: str, content_text: str):
+    """Store freshly generated section content on the project and in the Content table"""
+    # Reassign a copy so the JSON column change is detected
+    content = dict(project.content or {})
+    content[section_id] = {
+        "title": section_title,
+        "content": content_text,
+        "generated_at": datetime.now().isoformat()
+    }
+    project.content = content
+    
+    db.add(Content(
+        project_id=project.id,
+        section_id=section_id,
+        text=content_text
+    ))
+    await db.commit()
+
+
+async def _save_refinement(db: AsyncSession, project: Project, section_id: str, refinement_prompt: str, refined_text: str):
+    """Store refined section content, refinement history and Refinement/Content rows"""
+    content = dict(project.content or {})
+    content[section_id] = {
+        **content.get(section_id, {}),
+        "content": refined_text,
+        "refined_at": datetime.now().isoformat()
+    }
+    project.content = content
+    
+    # Store refinement history
+    project.refinement_history = list(project.refinement_history or []) + [{
+        "section_id": section_id,
+        "prompt": refinement_prompt,
+        "timestamp": datetime.now().isoformat()
+    }]
+    
+    # Store in Refinement table
+    db.add(Refinement(
+        project_id=project.id,
+        section_id=section_id,
+        prompt=refinement_prompt,
+        updated_text=refined_text
+    ))
+    
+    # Update Content table
+    result = await db.execute(
+        select(Content).where(
+            Content.project_id == project.id,
+            Content.section_id == section_id
+        ).order_by(Content.updated_at.desc()).limit(1)
+    )
+    content_obj = result.scalars().first()
+    
+    if content_obj:
+        content_obj.text = refined_text
+    else:
+        db.add(Content(
+            project_id=project.id,
+            section_id=section_id,
+            text=refined_text
+        ))
+    
+    await db.commit()
+
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event) + "\n"
+
+
+async def _open_stream(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Wait for the first chunk before the response starts, so a provider
+    failure is still answered with a 503 instead of a 200 stream
+    """
     try:
-        yield db
-    finally:
-        db.close()
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    
+    async def _resumed():
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    
+    return _resumed()
 
 
 @router.post("/{project_id}/generate")
 async def generate_project_content(
     project_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    no_cache: bool = False,
+    background: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Generate content for all sections/slides in a project"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    if not project.outline:
-        raise HTTPException(status_code=400, detail="Project outline is empty")
-    
-    if not project.topic:
-        raise HTTPException(status_code=400, detail="Project topic is required")
-    
-    generated_content = {}
-    
-    for item in project.outline:
-        section_id = item.get("id") or item.get("title", "").lower().replace(" ", "_")
-        section_title = item.get("title", item.get("name", ""))
+    """
+    Generate content for all sections/slides in a project.
+    
+    With ?background=true the work is queued as a job and a job id is returned
+    immediately; poll GET /projects/{project_id}/jobs/{job_id} for progress.
+    Retries carrying the same Idempotency-Key header replay the first response.
+    """
+    payload = {"project_id": project_id, "no_cache": no_cache, "background": background}
+    async with idempotent_request(db, response, current_user.id, "generate", idempotency_key, payload) as idem:
+        if idem.replay is not None:
+            return idem.replay
         
-        # Generate content using Gemini
-        content_text = generate_content(
-            topic=project.topic,
-            section_title=section_title,
-            doc_type=project.doc_type or "docx"
-        )
+        project = await get_user_project(db, project_id, current_user)
         
-        generated_content[section_id] = {
-            "title": section_title,
-            "content": content_text,
-            "generated_at": datetime.now().isoformat()
-        }
+        if not project.outline:
+            raise HTTPException(status_code=400, detail="Project outline is empty")
         
-        # Store in Content table
-        content_obj = Content(
-            project_id=project.id,
-            section_id=section_id,
-            text=content_text
+        if not project.topic:
+            raise HTTPException(status_code=400, detail="Project topic is required")
+        
+        if background:
+            job = await job_runner.submit(db, project, use_cache=not no_cache)
+            response.status_code = 202
+            return await idem.save(job_status(job))
+        
+        # Sections started speculatively after the AI outline are adopted, not regenerated
+        if no_cache:
+            speculator.discard(project.id)
+            staged = {}
+        else:
+            staged = speculator.claim_all(project.id, project_outline_version(project))
+        
+        # Fan out all sections at once; results come back in outline order
+        with llm_request_context(BULK, current_user.id):
+            sections = await generate_sections(
+                topic=project.topic,
+                outline=project.outline,
+                doc_type=project.doc_type or "docx",
+                use_cache=not no_cache,
+                staged=staged
+            )
+        
+        # Update project content (single transaction for all sections)
+        generated_content = await store_generated_sections(db, project, sections)
+        await db.refresh(project)
+        
+        return await idem.save({
+            "message": "Content generated successfully",
+            "content": generated_content
+        })
+
+
+@router.get("/{project_id}/jobs/{job_id}")
+async def get_generation_job(
+    project_id: int,
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Report progress of a background generation job"""
+    result = await db.execute(
+        select(GenerationJob).where(
+            GenerationJob.id == job_id,
+            GenerationJob.project_id == project_id,
+            GenerationJob.user_id == current_user.id
         )
-        db.add(content_obj)
+    )
+    job = result.scalars().first()
     
-    # Update project content
-    project.content = generated_content
-    db.commit()
-    db.refresh(project)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    return {
-        "message": "Content generated successfully",
-        "content": generated_content
-    }
+    return job_status(job)
 
 
 @router.post("/{project_id}/generate_section")
 async def generate_single_section(
     project_id: int,
     request: GenerateContentRequest,
-    db: Session = Depends(get_db),
+    response: Response,
+    no_cache: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Generate content for a single section/slide"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
+    payload = {"project_id": project_id, "request": request.model_dump(), "no_cache": no_cache}
+    async with idempotent_request(db, response, current_user.id, "generate_section", idempotency_key, payload) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        
+        project = await get_user_project(db, project_id, current_user)
+        
+        # Find section in outline
+        section = _find_section(project, request.section_id)
+        
+        if not section:
+            raise HTTPException(status_code=404, detail="Section not found")
+        
+        section_title = section.get("title", section.get("name", ""))
+        
+        # Get existing content if any
+        existing_content = None
+        if project.content and request.section_id in project.content:
+            existing_content = project.content[request.section_id].get("content", "")
+        
+        # A first generation may already be running speculatively (see /ai-outline)
+        content_text = None
+        if existing_content is None and not no_cache:
+            content_text = await speculator.claim(project.id, project_outline_version(project), request.section_id)
+        
+        # Generate content
+        if content_text is None:
+            with llm_request_context(INTERACTIVE, current_user.id):
+                content_text = await generate_content(
+                    topic=project.topic or "",
+                    section_title=section_title,
+                    doc_type=project.doc_type or "docx",
+                    existing_content=existing_content,
+                    use_cache=not no_cache
+                )
+        
+        await _save_section_content(db, project, request.section_id, section_title, content_text)
+        
+        return await idem.save({
+            "section_id": request.section_id,
+            "content": content_text
+        })
+
+
+@router.post("/{project_id}/generate_section/stream")
+async def stream_single_section(
+    project_id: int,
+    request: GenerateContentRequest,
+    no_cache: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Generate content for a single section/slide, streaming chunks as NDJSON.
     
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    Emits {"type": "chunk", "content": ...} lines while the model writes and a final
+    {"type": "done", ...} line once the full text has been saved. If the provider
+    fails mid-stream, a {"type": "error", ...} line ends the stream and nothing is saved.
+    """
+    project = await get_user_project(db, project_id, current_user)
     
-    # Find section in outline
-    section = None
-    for item in project.outline:
-        if item.get("id") == request.section_id or item.get("title", "").lower().replace(" ", "_") == request.section_id:
-            section = item
-            break
+    section = _find_section(project, request.section_id)
     
     if not section:
         raise HTTPException(status_code=404, detail="Section not found")
     
     section_title = section.get("title", section.get("name", ""))
     
-    # Get existing content if any
     existing_content = None
     if project.content and request.section_id in project.content:
         existing_content = project.content[request.section_id].get("content", "")
     
-    # Generate content
-    content_text = generate_content(
-        topic=project.topic or "",
-        section_title=section_title,
-        doc_type=project.doc_type or "docx",
-        existing_content=existing_content
-    )
-    
-    # Update project content
-    if not project.content:
-        project.content = {}
-    
-    project.content[request.section_id] = {
-        "title": section_title,
-        "content": content_text,
-        "generated_at": datetime.now().isoformat()
-    }
-    
-    # Store in Content table
-    content_obj = Content(
-        project_id=project.id,
-        section_id=request.section_id,
-        text=content_text
-    )
-    db.add(content_obj)
-    db.commit()
+    topic = project.topic or ""
+    doc_type = project.doc_type or "docx"
+    
+    with llm_request_context(INTERACTIVE, current_user.id):
+        upstream = await _open_stream(stream_content(topic, section_title, doc_type, existing_content, use_cache=not no_cache))
+    
+    async def event_stream():
+        chunks = []
+        try:
+            async for chunk in upstream:
+                chunks.append(chunk)
+                yield _ndjson({"type": "chunk", "content": chunk})
+        except LLMServiceError as e:
+            # The response has started, so report the failure in-band and keep the old content
+            yield _ndjson({"type": "error", "section_id": request.section_id, "detail": str(e)})
+            return
+        
+        content_text = "".join(chunks)
+        
+        # The request session is closed once streaming starts, so save with a fresh one
+        async with AsyncSessionLocal() as save_db:
+            saved_project = await save_db.get(Project, project_id)
+            if saved_project:
+                await _save_section_content(save_db, saved_project, request.section_id, section_title, content_text)
+        
+        yield _ndjson({"type": "done", "section_id": request.section_id, "content": content_text})
     
-    return {
-        "section_id": request.section_id,
-        "content": content_text
-    }
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
 
 
 @router.post("/{project_id}/refine")
 async def refine_section_content(
     project_id: int,
     request: RefineContentRequest,
-    db: Session = Depends(get_db),
+    response: Response,
+    no_cache: bool = False,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Refine content for a specific section/slide"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    payload = {"project_id": project_id, "request": request.model_dump(), "no_cache": no_cache}
+    async with idempotent_request(db, response, current_user.id, "refine", idempotency_key, payload) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        
+        project = await get_user_project(db, project_id, current_user)
+        
+        if not project.content or request.section_id not in project.content:
+            raise HTTPException(status_code=404, detail="Section content not found")
+        
+        original_content = project.content[request.section_id].get("content", "")
+        section_title = project.content[request.section_id].get("title", "")
+        
+        # Refine using Gemini
+        with llm_request_context(INTERACTIVE, current_user.id):
+            refined_text = await refine_content(
+                original_content=original_content,
+                refinement_prompt=request.refinement_prompt,
+                topic=project.topic or "",
+                section_title=section_title,
+                doc_type=project.doc_type or "docx",
+                use_cache=not no_cache
+            )
+        
+        await _save_refinement(db, project, request.section_id, request.refinement_prompt, refined_text)
+        
+        return await idem.save({
+            "section_id": request.section_id,
+            "refined_content": refined_text
+        })
+
+
+@router.post("/{project_id}/refine/stream")
+async def stream_refine_section_content(
+    project_id: int,
+    request: RefineContentRequest,
+    no_cache: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Refine content for a specific section/slide, streaming chunks as NDJSON (same events as generate_section/stream)"""
+    project = await get_user_project(db, project_id, current_user)
     
     if not project.content or request.section_id not in project.content:
         raise HTTPException(status_code=404, detail="Section content not found")
     
     original_content = project.content[request.section_id].get("content", "")
     section_title = project.content[request.section_id].get("title", "")
+    topic = project.topic or ""
+    doc_type = project.doc_type or "docx"
+    
+    with llm_request_context(INTERACTIVE, current_user.id):
+        upstream = await _open_stream(stream_refinement(original_content, request.refinement_prompt, topic, section_title, doc_type, use_cache=not no_cache))
+    
+    async def event_stream():
+        chunks = []
+        try:
+            async for chunk in upstream:
+                chunks.append(chunk)
+                yield _ndjson({"type": "chunk", "content": chunk})
+        except LLMServiceError as e:
+            yield _ndjson({"type": "error", "section_id": request.section_id, "detail": str(e)})
+            return
+        
+        refined_text = "".join(chunks)
+        
+        async with AsyncSessionLocal() as save_db:
+            saved_project = await save_db.get(Project, project_id)
+            if saved_project:
+                await _save_refinement(save_db, saved_project, request.section_id, request.refinement_prompt, refined_text)
+        
+        yield _ndjson({"type": "done", "section_id": request.section_id, "refined_content": refined_text})
     
-    # Refine using Gemini
-    refined_text = refine_content(
-        original_content=original_content,
-        refinement_prompt=request.refinement_prompt,
-        topic=project.topic or "",
-        section_title=section_title
-    )
-    
-    # Update content
-    project.content[request.section_id]["content"] = refined_text
-    project.content[request.section_id]["refined_at"] = datetime.now().isoformat()
-    
-    # Store refinement history
-    if not project.refinement_history:
-        project.refinement_history = []
-    
-    project.refinement_history.append({
-        "section_id": request.section_id,
-        "prompt": request.refinement_prompt,
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Store in Refinement table
-    refinement_obj = Refinement(
-        project_id=project.id,
-        section_id=request.section_id,
-        prompt=request.refinement_prompt,
-        updated_text=refined_text
-    )
-    db.add(refinement_obj)
-    
-    # Update Content table
-    content_obj = db.query(Content).filter(
-        Content.project_id == project.id,
-        Content.section_id == request.section_id
-    ).order_by(Content.updated_at.desc()).first()
-    
-    if content_obj:
-        content_obj.text = refined_text
-    else:
-        content_obj = Content(
-            project_id=project.id,
-            section_id=request.section_id,
-            text=refined_text
-        )
-        db.add(content_obj)
-    
-    db.commit()
-    db.refresh(project)
-    
-    return {
-        "section_id": request.section_id,
-        "refined_content": refined_text
-    }
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
 
 
 @router.post("/{project_id}/feedback")
 async def submit_feedback(
     project_id: int,
     request: FeedbackRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Submit feedback (like/dislike/comment) for a section"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
+    project = await get_user_project(db, project_id, current_user)
     
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    # Work on a copy and reassign it so the JSON column change is detected
+    feedback = copy.deepcopy(project.feedback or {})
     
-    if not project.feedback:
-        project.feedback = {}
-    
-    if request.section_id not in project.feedback:
-        project.feedback[request.section_id] = {}
+    if request.section_id not in feedback:
+        feedback[request.section_id] = {}
     
     if request.like is not None:
-        project.feedback[request.section_id]["like"] = request.like
+        feedback[request.section_id]["like"] = request.like
     
     if request.comment:
-        if "comments" not in project.feedback[request.section_id]:
-            project.feedback[request.section_id]["comments"] = []
-        project.feedback[request.section_id]["comments"].append({
+        if "comments" not in feedback[request.section_id]:
+            feedback[request.section_id]["comments"] = []
+        feedback[request.section_id]["comments"].append({
             "comment": request.comment,
             "timestamp": datetime.now().isoformat()
         })
     
-    db.commit()
-    db.refresh(project)
+    project.feedback = feedback
+    
+    await db.commit()
+    await db.refresh(project)
     
     return {"message": "Feedback submitted successfully"}
 
@@ -277,20 +459,16 @@ async def submit_feedback(
 async def generate_ai_outline(
     project_id: int,
     request: AIGenerateOutlineRequest,
-    db: Session = Depends(get_db),
+    no_cache: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Generate outline using AI"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
     
     # Generate outline using Gemini
-    outline_titles = generate_outline(request.topic, request.doc_type)
+    with llm_request_context(INTERACTIVE, current_user.id):
+        outline_titles = await generate_outline(request.topic, request.doc_type, use_cache=not no_cache)
     
     # Format outline
     outline = []
@@ -306,8 +484,11 @@ async def generate_ai_outline(
     project.topic = request.topic
     project.doc_type = request.doc_type
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
+    
+    # Opt-in: start on the first sections while the user looks at the outline
+    speculator.start(project.id, current_user.id, request.topic, request.doc_type, outline)
     
     return {
         "outline": outline,
@@ -315,20 +496,40 @@ async def generate_ai_outline(
     }
 
 
+async def _export(project: Project, doc_type: str, if_none_match: Optional[str]) -> Response:
+    """
+    Serve an export from the render cache, or render it on the export worker
+    pool. The ETag is a hash of the rendered content, so a matching
+    If-None-Match is answered with a 304 without rendering.
+    """
+    snapshot = export_snapshot(project)
+    key = export_key(snapshot, doc_type)
+    cache_headers = {"ETag": etag_for(key), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, cache_headers["ETag"]):
+        return Response(status_code=304, headers=cache_headers)
+    
+    try:
+        rendered, hit = await cached_render(snapshot, doc_type, key)
+    except ExportBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many exports in progress, please try again shortly.",
+            headers={"Retry-After": "1"}
+        )
+    cache_headers["X-Export-Cache"] = "hit" if hit else "miss"
+    
+    return export_response(rendered, doc_type, export_filename(project.title, doc_type), cache_headers)
+
+
 @router.get("/{project_id}/export/docx")
 async def export_docx(
     project_id: int,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Export project as Word document"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
     
     if project.doc_type != "docx":
         raise HTTPException(status_code=400, detail="Project is not a Word document")
@@ -336,58 +537,18 @@ async def export_docx(
     if not project.content:
         raise HTTPException(status_code=400, detail="No content to export")
     
-    # Create Word document
-    doc = Document()
-    
-    # Add title
-    doc.add_heading(project.title, 0)
-    
-    # Add topic if available
-    if project.topic:
-        doc.add_paragraph(f"Topic: {project.topic}")
-        doc.add_paragraph("")  # Empty line
-    
-    # Add sections
-    for item in project.outline:
-        section_id = item.get("id") or item.get("title", "").lower().replace(" ", "_")
-        section_title = item.get("title", item.get("name", ""))
-        
-        # Add heading
-        doc.add_heading(section_title, level=1)
-        
-        # Add content
-        if section_id in project.content:
-            content_text = project.content[section_id].get("content", "")
-            doc.add_paragraph(content_text)
-        
-        doc.add_paragraph("")  # Empty line between sections
-    
-    # Save to temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".docx")
-    doc.save(temp_file.name)
-    temp_file.close()
-    
-    return FileResponse(
-        temp_file.name,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        filename=f"{project.title.replace(' ', '_')}.docx"
-    )
+    return await _export(project, "docx", if_none_match)
 
 
 @router.get("/{project_id}/export/pptx")
 async def export_pptx(
     project_id: int,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Export project as PowerPoint presentation"""
-    project = db.query(Project).filter(
-        Project.id == project_id,
-        Project.user_id == current_user.id
-    ).first()
-    
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
     
     if project.doc_type != "pptx":
         raise HTTPException(status_code=400, detail="Project is not a PowerPoint presentation")
@@ -395,61 +556,43 @@ async def export_pptx(
     if not project.content:
         raise HTTPException(status_code=400, detail="No content to export")
     
-    # Create PowerPoint presentation
-    prs = Presentation()
-    
-    # Add title slide
-    title_slide_layout = prs.slide_layouts[0]
-    slide = prs.slides.add_slide(title_slide_layout)
-    title = slide.shapes.title
-    subtitle = slide.placeholders[1]
-    
-    title.text = project.title
-    if project.topic:
-        subtitle.text = project.topic
-    
-    # Add content slides
-    for item in project.outline:
-        section_id = item.get("id") or item.get("title", "").lower().replace(" ", "_")
-        section_title = item.get("title", item.get("name", ""))
-        
-        # Use Title and Content layout
-        bullet_slide_layout = prs.slide_layouts[1]
-        slide = prs.slides.add_slide(bullet_slide_layout)
-        shapes = slide.shapes
-        
-        title_shape = shapes.title
-        body_shape = shapes.placeholders[1]
-        
-        title_shape.text = section_title
-        
-        tf = body_shape.text_frame
-        tf.text = ""  # Clear default text
-        
-        if section_id in project.content:
-            content_text = project.content[section_id].get("content", "")
-            # Split into bullet points
-            paragraphs = content_text.split('\n')
-            first = True
-            for para in paragraphs:
-                if para.strip():
-                    if first:
-                        tf.text = para.strip()
-                        first = False
-                    else:
-                        p = tf.add_paragraph()
-                        p.text = para.strip()
-                        p.level = 0
-                        p.font.size = Pt(14)
-    
-    # Save to temporary file
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pptx")
-    prs.save(temp_file.name)
-    temp_file.close()
-    
-    return FileResponse(
-        temp_file.name,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-        filename=f"{project.title.replace(' ', '_')}.pptx"
-    )
+    return await _export(project, "pptx", if_none_match)
+
 
+@router.post("/export/bulk")
+async def export_bulk(
+    data: BulkExportRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export several projects (all of the user's projects when no ids are
+    given) as one ZIP archive, each in its own format. The archive is
+    streamed as projects finish; manifest.json lists per-project errors.
+    "All" is capped at EXPORT_BULK_MAX_PROJECTS like an explicit list; the
+    projects left out are listed in the manifest.
+    """
+    omitted = []
+    if data.project_ids is None:
+        result = await db.execute(
+            select(Project.id).where(Project.user_id == current_user.id).order_by(Project.id)
+        )
+        project_ids = list(result.scalars().all())
+        project_ids, omitted = project_ids[:EXPORT_BULK_MAX_PROJECTS], project_ids[EXPORT_BULK_MAX_PROJECTS:]
+    else:
+        if len(data.project_ids) > EXPORT_BULK_MAX_PROJECTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many projects for one bulk export (limit {EXPORT_BULK_MAX_PROJECTS})"
+            )
+        project_ids = list(dict.fromkeys(data.project_ids))
+    
+    if not project_ids:
+        raise HTTPException(status_code=400, detail="No projects to export")
+    
+    filename = f"projects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_bulk_export(current_user.id, project_ids, omitted),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(filename), "X-Export-Omitted": str(len(omitted))}
+    )
@@ -0,0 +1,197 @@
+"""
+Idempotency-Key support for the generation and refinement endpoints
+
+A client that retries a POST with the same Idempotency-Key header gets the
+stored response of the first request instead of a second LLM call and a
+second set of Content/Refinement rows. Keys are scoped per user and endpoint,
+stored in the idempotency_keys table, expire after IDEMPOTENCY_TTL and the
+table is capped at IDEMPOTENCY_MAX_ENTRIES rows.
+
+    async with idempotent_request(db, response, user.id, "refine", key, payload) as idem:
+        if idem.replay is not None:
+            return idem.replay
+        ...
+        return await idem.save(result)
+
+The first request reserves the key before doing any work. A concurrent
+duplicate gets 409 while it runs, a key reused with a different request gets
+422, and a failed request releases the key so the client can retry it.
+"""
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_LOCK_TIMEOUT
+from .models import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+# Expired and overflow rows are pruned in batches rather than on every request
+PRUNE_EVERY = 100
+_reservations = 0
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of everything that determines the response"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotentRequest:
+    """State of one request carrying an Idempotency-Key (or none)"""
+
+    def __init__(self, db: AsyncSession, response: Response, record: Optional[IdempotencyKey] = None):
+        self.db = db
+        self.response = response
+        self.record = record
+        self.replay: Optional[Any] = None
+        self.saved = False
+
+    async def save(self, body: Any) -> Any:
+        """Store the successful response for replays and return it unchanged"""
+        if self.record is not None:
+            self.record.status_code = self.response.status_code or 200
+            self.record.response = body
+            await self.db.commit()
+        self.saved = True
+        return body
+
+
+async def _prune(db: AsyncSession, now: datetime) -> None:
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+    overflow = (
+        select(IdempotencyKey.id)
+        .order_by(IdempotencyKey.id.desc())
+        .offset(IDEMPOTENCY_MAX_ENTRIES)
+    )
+    await db.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(overflow)))
+
+
+async def _find(db: AsyncSession, user_id: int, endpoint: str, key: str) -> Optional[IdempotencyKey]:
+    result = await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.endpoint == endpoint,
+            IdempotencyKey.key == key
+        )
+    )
+    return result.scalars().first()
+
+
+async def _reserve(db: AsyncSession, user_id: int, endpoint: str, key: str, fingerprint: str) -> IdempotencyKey:
+    """Insert an in-progress row for the key; raises IntegrityError if it already exists"""
+    global _reservations
+    now = datetime.now()
+    _reservations += 1
+    if _reservations % PRUNE_EVERY == 0:
+        await _prune(db, now)
+
+    record = IdempotencyKey(
+        user_id=user_id,
+        endpoint=endpoint,
+        key=key,
+        fingerprint=fingerprint,
+        created_at=now,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL)
+    )
+    db.add(record)
+    await db.commit()
+    return record
+
+
+@asynccontextmanager
+async def idempotent_request(
+    db: AsyncSession,
+    response: Response,
+    user_id: int,
+    endpoint: str,
+    key: Optional[str],
+    payload: Dict[str, Any]
+):
+    """
+    Look up or reserve an Idempotency-Key. Call this before loading any ORM
+    objects from the session: a lost insert race rolls the session back.
+    """
+    if not key:
+        yield IdempotentRequest(db, response)
+        return
+
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    fingerprint = request_fingerprint({"endpoint": endpoint, **payload})
+    now = datetime.now()
+
+    record = await _find(db, user_id, endpoint, key)
+    if record is not None and record.expires_at <= now:
+        await db.delete(record)
+        await db.commit()
+        record = None
+
+    if record is None:
+        try:
+            record = await _reserve(db, user_id, endpoint, key, fingerprint)
+        except IntegrityError:
+            # A concurrent request with the same key won the insert
+            await db.rollback()
+            record = await _find(db, user_id, endpoint, key)
+            if record is None:
+                raise HTTPException(
+                    status_code=409,
+                    detail="A request with this Idempotency-Key is in progress",
+                    headers={"Retry-After": "1"}
+                )
+        else:
+            idem = IdempotentRequest(db, response, record)
+            async with _release_on_failure(idem):
+                yield idem
+            return
+
+    if record.fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request"
+        )
+
+    if record.status_code is not None:
+        idem = IdempotentRequest(db, response)
+        idem.replay = record.response
+        response.status_code = record.status_code
+        response.headers[REPLAY_HEADER] = "true"
+        yield idem
+        return
+
+    if record.created_at + timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT) > now:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"}
+        )
+
+    # The first attempt never finished (crash or restart): take the key over
+    record.created_at = now
+    record.expires_at = now + timedelta(seconds=IDEMPOTENCY_TTL)
+    await db.commit()
+    idem = IdempotentRequest(db, response, record)
+    async with _release_on_failure(idem):
+        yield idem
+
+
+@asynccontextmanager
+async def _release_on_failure(idem: IdempotentRequest):
+    try:
+        yield
+    finally:
+        if not idem.saved and idem.record is not None:
+            # Failed (or cancelled) before a response was stored: free the key for a retry
+            record_id = idem.record.id
+            await idem.db.rollback()
+            await idem.db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+            await idem.db.commit()
@@ -2,11 +2,26 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
-from .auth.routes import router as auth_router
+from .auth.routes import router as auth_router, principal_cache
 from .projects_routes import router as projects_router
 from .document_routes import router as document_router
-from .database import engine, Base
-from .models import User, Project, Content, Refinement
+from .database import engine, async_engine, Base, start_request_stats
+from .migrations import run_migrations
+from .services.openrouter_client import start_client, close_client
+from .services.llm_cache import llm_cache
+from .auth.utils import password_hasher
+from .services.jobs import job_runner
+from .services.scheduler import llm_scheduler
+from .services.gemini_service import single_flight
+from .services.llm_backend import llm_backend
+from .services.resilience import LLMServiceError, openrouter_breaker, openrouter_retry
+from .services.model_router import model_router
+from .services.generation import batch_stats
+from .services.speculation import speculator
+from .services.prompt_budget import prompt_budget, PromptTooLargeError
+from .services.exporter import export_renderer
+from .services.export_cache import export_cache
+import math
 import traceback
 
 app = FastAPI(
@@ -29,8 +44,21 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Sessions", "X-DB-Checkout-Ms", "Idempotent-Replayed", "X-Export-Queue-Ms", "X-Export-Render-Ms", "X-Export-Cache", "X-Export-Omitted", "ETag"],
 )
 
+
+# Per-request DB stats: query count (spot N+1 regressions) and connection checkout time
+@app.middleware("http")
+async def db_stats_middleware(request: Request, call_next):
+    stats = start_request_stats()
+    response = await call_next(request)
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["X-DB-Sessions"] = str(stats.sessions)
+    response.headers["X-DB-Checkout-Ms"] = f"{stats.checkout_ms:.2f}"
+    return response
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -45,6 +73,31 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# LLM provider failures (after retries, or while the circuit breaker is open)
+@app.exception_handler(LLMServiceError)
+async def llm_service_exception_handler(request: Request, exc: LLMServiceError):
+    """Tell the client to retry later instead of saving an error as content"""
+    headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={
+            "detail": str(exc),
+            "type": type(exc).__name__
+        },
+        headers=headers
+    )
+
+# Prompts that cannot fit the model's context window
+@app.exception_handler(PromptTooLargeError)
+async def prompt_too_large_exception_handler(request: Request, exc: PromptTooLargeError):
+    return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={
+            "detail": str(exc),
+            "type": type(exc).__name__
+        }
+    )
+
 # Validation error handler
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -62,12 +115,33 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def startup_event():
     try:
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         print("✅ Database tables ready")
     except Exception as e:
         print(f"⚠️  Database initialization issue: {e}")
         import traceback
         traceback.print_exc()
 
+    # Shared, connection-pooled OpenRouter client
+    await start_client()
+    # Dedicated bcrypt worker pool
+    password_hasher.start()
+    # Export rendering pool (DOCX/PPTX are built off the event loop)
+    export_renderer.start()
+    # Background generation jobs (resumes interrupted ones)
+    await job_runner.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_runner.stop()
+    speculator.shutdown()
+    await close_client()
+    llm_cache.close()
+    password_hasher.shutdown()
+    export_renderer.shutdown()
+    await async_engine.dispose()
+
 app.include_router(auth_router)
 app.include_router(projects_router)
 app.include_router(document_router)
@@ -90,7 +164,23 @@ def health_check():
             conn.execute(text("SELECT 1"))
         return {
             "status": "healthy",
-            "database": "connected"
+            "database": "connected",
+            "llm_cache": llm_cache.stats(),
+            "password_hasher": password_hasher.stats(),
+            "principal_cache": principal_cache.stats(),
+            "llm_backend": llm_backend.name,
+            "llm_scheduler": llm_scheduler.stats(),
+            "llm_single_flight": single_flight.stats(),
+            "llm_upstream": {
+                "circuit_breaker": openrouter_breaker.stats(),
+                "retries": openrouter_retry.stats()
+            },
+            "llm_routing": model_router.stats(),
+            "generation_batching": batch_stats,
+            "speculation": speculator.stats(),
+            "prompt_budget": prompt_budget.stats(),
+            "exports": export_renderer.stats(),
+            "export_cache": export_cache.stats()
         }
     except Exception as e:
         return JSONResponse(
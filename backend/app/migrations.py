@@ -0,0 +1,44 @@
+"""
+Idempotent schema migrations for existing databases
+
+create_all() only creates missing tables; it never changes tables that already
+exist. Anything added to an existing table goes here and is safe to run on
+every startup.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+
+def migrate_user_email_index(engine: Engine) -> bool:
+    """
+    Backfill normalized (trimmed, lowercased) emails and create the unique
+    ix_users_email_lower index. Returns False if duplicate emails prevent the
+    index from being created.
+    """
+    if not inspect(engine).has_table("users"):
+        return True
+
+    with engine.begin() as conn:
+        duplicates = conn.execute(text(
+            "SELECT lower(trim(email)) AS normalized, COUNT(*) FROM users"
+            " GROUP BY normalized HAVING COUNT(*) > 1"
+        )).fetchall()
+        if duplicates:
+            emails = ", ".join(row[0] for row in duplicates)
+            print(f"⚠️  Cannot create ix_users_email_lower: duplicate emails ({emails})")
+            return False
+
+        updated = conn.execute(text(
+            "UPDATE users SET email = lower(trim(email)) WHERE email != lower(trim(email))"
+        )).rowcount
+        if updated:
+            print(f"✅ Normalized {updated} user email(s)")
+
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))"
+        ))
+    return True
+
+
+def run_migrations(engine: Engine) -> None:
+    migrate_user_email_index(engine)
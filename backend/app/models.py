@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, func, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, DateTime, func, Text, Index, Boolean
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -13,6 +13,9 @@ class User(Base):
 
     projects = relationship("Project", back_populates="user", cascade="all, delete-orphan")
 
+# Case-insensitive email lookups (login/register) hit this index instead of scanning users
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
+
 class Project(Base):
     __tablename__ = "projects"
 
@@ -53,3 +56,36 @@ class Refinement(Base):
     updated_text = Column(Text, nullable=False)
     timestamp = Column(DateTime, default=func.now())
 
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    topic = Column(Text, nullable=False)
+    doc_type = Column(String, nullable=False)
+    outline = Column(JSON, default=[])  # Snapshot of the outline at submission time
+    results = Column(JSON, default={})  # Finished sections by section id
+    total_sections = Column(Integer, nullable=False, default=0)
+    completed_sections = Column(Integer, nullable=False, default=0)
+    use_cache = Column(Boolean, nullable=False, default=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    endpoint = Column(String, nullable=False)  # e.g. "generate_section"
+    key = Column(String, nullable=False)  # Client-supplied Idempotency-Key header
+    fingerprint = Column(String, nullable=False)  # Hash of the request the key was first used with
+    status_code = Column(Integer, nullable=True)  # None while the first request is still running
+    response = Column(JSON, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# One stored response per user, endpoint and key
+Index("ix_idempotency_keys_scope", IdempotencyKey.user_id, IdempotencyKey.endpoint, IdempotencyKey.key, unique=True)
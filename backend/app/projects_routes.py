@@ -1,30 +1,36 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import SessionLocal
+from .database import get_async_db
 from .models import Project, User
 from .schemas import ProjectCreate, ProjectUpdate, ProjectResponse
 from .auth.routes import get_current_user
+from .services.speculation import speculator, project_outline_version
 
 router = APIRouter(prefix="/projects", tags=["Projects"])
 
 
-# DB dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_user_project(db: AsyncSession, project_id: int, current_user: User) -> Project:
+    """Load a project owned by the current user or raise 404"""
+    result = await db.execute(
+        select(Project).where(Project.id == project_id, Project.user_id == current_user.id)
+    )
+    project = result.scalars().first()
+
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return project
 
 
 # ---------------------------------------------------
 # Create Project (ONLY for logged-in user)
 # ---------------------------------------------------
 @router.post("/", response_model=ProjectResponse)
-def create_project(
+async def create_project(
     data: ProjectCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     project = Project(
@@ -40,8 +46,8 @@ def create_project(
     )
 
     db.add(project)
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
 
@@ -49,30 +55,24 @@ def create_project(
 # Get all projects of logged-in user
 # ---------------------------------------------------
 @router.get("/", response_model=list[ProjectResponse])
-def get_projects(
-    db: Session = Depends(get_db),
+async def get_projects(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Project).filter(Project.user_id == current_user.id).all()
+    result = await db.execute(select(Project).where(Project.user_id == current_user.id))
+    return result.scalars().all()
 
 
 # ---------------------------------------------------
 # Get single project
 # ---------------------------------------------------
 @router.get("/{project_id}", response_model=ProjectResponse)
-def get_project(
+async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    project = (
-        db.query(Project)
-        .filter(Project.id == project_id, Project.user_id == current_user.id)
-        .first()
-    )
-
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
 
     return project
 
@@ -81,20 +81,13 @@ def get_project(
 # Update Project
 # ---------------------------------------------------
 @router.put("/{project_id}", response_model=ProjectResponse)
-def update_project(
+async def update_project(
     project_id: int,
     data: ProjectUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    project = (
-        db.query(Project)
-        .filter(Project.id == project_id, Project.user_id == current_user.id)
-        .first()
-    )
-
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
 
     if data.title is not None:
         project.title = data.title
@@ -120,8 +113,11 @@ def update_project(
     if data.description is not None:
         project.description = data.description
 
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
+
+    # Speculative sections made for the old outline/topic are no longer wanted
+    speculator.discard_stale(project.id, project_outline_version(project))
     return project
 
 
@@ -129,20 +125,14 @@ def update_project(
 # Delete Project
 # ---------------------------------------------------
 @router.delete("/{project_id}")
-def delete_project(
+async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    project = (
-        db.query(Project)
-        .filter(Project.id == project_id, Project.user_id == current_user.id)
-        .first()
-    )
-
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_user_project(db, project_id, current_user)
 
-    db.delete(project)
-    db.commit()
+    await db.delete(project)
+    await db.commit()
+    speculator.discard(project_id)
     return {"message": "Project deleted successfully"}
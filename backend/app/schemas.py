@@ -85,3 +85,7 @@ class FeedbackRequest(BaseModel):
 class AIGenerateOutlineRequest(BaseModel):
     topic: str
     doc_type: str  # "docx" or "pptx"
+
+
+class BulkExportRequest(BaseModel):
+    project_ids: Optional[List[int]] = None  # None exports all of the user's projects
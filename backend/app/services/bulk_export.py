@@ -0,0 +1,186 @@
+"""
+Bulk export: many projects in one streamed ZIP archive
+
+Each project is exported in its own format (docx or pptx) through the same
+export cache and render pool as a single export. At most
+EXPORT_BULK_CONCURRENCY projects are loaded and rendered at a time, and a
+slot is only given back once that project's file has been written to the
+archive, so memory depends on the concurrency limit and not on how many
+projects are exported. Entries are written in the order they finish.
+
+The archive goes to a write-only stream (each entry's sizes and CRC follow
+it in a data descriptor) and is sent to the client as it grows. Rendered
+files are already compressed, so they are stored as is. manifest.json comes
+last and lists every requested project with its file name, or the reason it
+was left out, plus any projects over the EXPORT_BULK_MAX_PROJECTS cap.
+"""
+import asyncio
+import io
+import json
+import time
+import zipfile
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from ..config import EXPORT_BULK_CONCURRENCY, EXPORT_CHUNK_SIZE
+from ..database import AsyncSessionLocal
+from ..models import Project
+from .exporter import MEDIA_TYPES, ExportBusy, RenderedExport, export_filename, export_snapshot
+from .export_cache import cached_render, export_key
+
+MANIFEST_NAME = "manifest.json"
+# A full export queue is retried this many times, one second apart (the single export's Retry-After)
+BUSY_RETRIES = 10
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only sink for ZipFile; what has been written so far is taken out with drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _entry_name(project: Project) -> str:
+    # The id keeps names unique; slashes in a title would otherwise become folders
+    filename = export_filename(project.title, project.doc_type).replace("/", "_").replace("\\", "_")
+    return f"{project.id}_{filename}"
+
+
+async def _export_project(project_id: int, user_id: int) -> Tuple[Dict[str, Any], Optional[RenderedExport]]:
+    """Manifest entry for one project, plus its rendered file when it could be exported"""
+    entry: Dict[str, Any] = {"project_id": project_id}
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Project).where(Project.id == project_id, Project.user_id == user_id)
+        )
+        project = result.scalars().first()
+        if project is None:
+            return {**entry, "status": "error", "error": "Project not found"}, None
+        entry.update(title=project.title, doc_type=project.doc_type)
+        if project.doc_type not in MEDIA_TYPES:
+            return {**entry, "status": "error", "error": "Unsupported document type"}, None
+        if not project.content:
+            return {**entry, "status": "error", "error": "No content to export"}, None
+        snapshot = export_snapshot(project)
+        name = _entry_name(project)
+
+    doc_type = entry["doc_type"]
+    key = export_key(snapshot, doc_type)
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            rendered, hit = await cached_render(snapshot, doc_type, key)
+            break
+        except ExportBusy:
+            if attempt == BUSY_RETRIES:
+                return {**entry, "status": "error", "error": "Too many exports in progress"}, None
+            await asyncio.sleep(1)
+        except Exception as e:
+            print(f"⚠️  Bulk export of project {project_id} failed: {e}")
+            return {**entry, "status": "error", "error": f"Rendering failed: {e}"}, None
+
+    entry.update(status="ok", file=name, size=rendered.size, cache="hit" if hit else "miss")
+    return entry, rendered
+
+
+async def _write_entry(archive: zipfile.ZipFile, sink: _ZipStream, name: str, rendered: RenderedExport) -> AsyncIterator[bytes]:
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    # Known up front, so ZIP64 is only used for files that need it
+    info.file_size = rendered.size
+    with archive.open(info, "w") as out:
+        while True:
+            chunk = await asyncio.to_thread(rendered.file.read, EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(chunk)
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def stream_bulk_export(user_id: int, project_ids: List[int], omitted: Optional[List[int]] = None) -> AsyncIterator[bytes]:
+    """
+    The ZIP archive for `project_ids`, in pieces. Projects that are missing,
+    belong to someone else, have no content or fail to render are reported
+    in the manifest instead of failing the whole archive, as is any other
+    error while exporting one of them. `omitted` lists projects left out
+    because of EXPORT_BULK_MAX_PROJECTS.
+    """
+    sink = _ZipStream()
+    archive = zipfile.ZipFile(sink, "w")
+    slots = asyncio.Semaphore(max(1, EXPORT_BULK_CONCURRENCY))
+    finished: asyncio.Queue = asyncio.Queue()
+    running: Set[asyncio.Task] = set()
+
+    async def export_one(index: int, project_id: int) -> None:
+        try:
+            result = await _export_project(project_id, user_id)
+        except asyncio.CancelledError:
+            slots.release()
+            raise
+        except Exception as e:
+            # One broken project must not stall the archive: it becomes a manifest entry
+            print(f"⚠️  Bulk export of project {project_id} failed: {e}")
+            result = ({"project_id": project_id, "status": "error", "error": f"Export failed: {e}"}, None)
+        # The slot stays taken until the file is in the archive
+        finished.put_nowait((index, result))
+
+    async def feed() -> None:
+        # Tasks are only created as slots free up, however many projects there are
+        for index, project_id in enumerate(project_ids):
+            await slots.acquire()
+            task = asyncio.create_task(export_one(index, project_id))
+            running.add(task)
+            task.add_done_callback(running.discard)
+
+    feeder = asyncio.create_task(feed())
+    entries: List[Optional[Dict[str, Any]]] = [None] * len(project_ids)
+    try:
+        for _ in range(len(project_ids)):
+            index, (entry, rendered) = await finished.get()
+            entries[index] = entry
+            try:
+                if rendered is not None:
+                    async for chunk in _write_entry(archive, sink, entry["file"], rendered):
+                        if chunk:
+                            yield chunk
+            finally:
+                if rendered is not None:
+                    rendered.close()
+                slots.release()
+
+        exported = sum(1 for entry in entries if entry["status"] == "ok")
+        manifest = {
+            "created_at": datetime.now().isoformat(),
+            "projects": len(entries),
+            "exported": exported,
+            "failed": len(entries) - exported,
+            "omitted_project_ids": omitted or [],
+            "entries": entries,
+        }
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False), zipfile.ZIP_DEFLATED)
+        archive.close()
+        yield sink.drain()
+    finally:
+        # The client went away (or something failed): stop the rest and release finished files
+        feeder.cancel()
+        for task in list(running):
+            task.cancel()
+        while not finished.empty():
+            _, (_, rendered) = finished.get_nowait()
+            if rendered is not None:
+                rendered.close()
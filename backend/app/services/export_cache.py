@@ -0,0 +1,181 @@
+"""
+Content-addressed cache of rendered exports
+
+An export is keyed on a hash of everything that ends up in the file: title,
+topic, outline order and titles, section text, the format and the
+renderers' TEMPLATE_VERSION. Any edit to a project (update, refine,
+generate_section) changes the key, so a stale file is never served and
+nothing has to be invalidated explicitly.
+
+The key doubles as a strong ETag. A client that sends it back in
+If-None-Match gets a 304 without anything being rendered or read.
+
+Files live in EXPORT_CACHE_DIR, bounded to EXPORT_CACHE_MAX_BYTES, and the
+least recently used files are evicted first. Access order survives restarts
+through file modification times.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import EXPORT_CACHE_ENABLED, EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES
+from .exporter import TEMPLATE_VERSION, RenderedExport, export_renderer
+
+
+def export_key(snapshot: Dict[str, Any], doc_type: str) -> str:
+    payload = {"format": doc_type, "template": TEMPLATE_VERSION, "snapshot": snapshot}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match may be "*" or a list of (possibly weak) ETags"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class ExportCache:
+    """On-disk LRU of rendered files; blocking work runs in a worker thread"""
+
+    def __init__(self, directory: Path, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # file name -> size, least recently used first
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _index(self) -> "OrderedDict[str, int]":
+        """Load the index from the directory on first use (caller holds the lock)"""
+        if self._entries is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+            self._bytes = sum(self._entries.values())
+        return self._entries
+
+    def _open(self, name: str) -> Optional[RenderedExport]:
+        with self._lock:
+            entries = self._index()
+            size = entries.get(name)
+            if size is None:
+                self.misses += 1
+                return None
+            entries.move_to_end(name)
+        path = self.directory / name
+        try:
+            f = open(path, "rb")
+            os.utime(path)
+        except OSError:
+            # Removed behind our back
+            with self._lock:
+                if self._entries.pop(name, None) is not None:
+                    self._bytes -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return RenderedExport(f, size)
+
+    def _store(self, name: str, rendered: RenderedExport) -> None:
+        if rendered.size > self.max_bytes:
+            return
+        with self._lock:
+            self._index()
+        # Write under a temporary name, then rename: readers never see a partial file
+        with NamedTemporaryFile(dir=self.directory, prefix=".tmp-", delete=False) as f:
+            try:
+                shutil.copyfileobj(rendered.file, f)
+            finally:
+                rendered.file.seek(0)
+        try:
+            os.replace(f.name, self.directory / name)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+        with self._lock:
+            entries = self._index()
+            self._bytes += rendered.size - entries.pop(name, 0)
+            entries[name] = rendered.size
+            self.stores += 1
+            while self._bytes > self.max_bytes and entries:
+                victim, size = entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    os.unlink(self.directory / victim)
+                except OSError:
+                    pass  # Still open on Windows; picked up again on the next start
+
+    async def get(self, key: str, doc_type: str) -> Optional[RenderedExport]:
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._open, f"{key}.{doc_type}")
+
+    async def set(self, key: str, doc_type: str, rendered: RenderedExport) -> None:
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._store, f"{key}.{doc_type}", rendered)
+        except OSError as e:
+            # A full or read-only disk only costs us the cache
+            rendered.file.seek(0)
+            print(f"⚠️  Export cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries) if self._entries is not None else None
+            return {
+                "enabled": self.enabled,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
+
+
+export_cache = ExportCache(
+    directory=EXPORT_CACHE_DIR,
+    max_bytes=EXPORT_CACHE_MAX_BYTES,
+    enabled=EXPORT_CACHE_ENABLED,
+)
+
+
+async def cached_render(snapshot: Dict[str, Any], doc_type: str, key: str) -> Tuple[RenderedExport, bool]:
+    """
+    The cached file for `key`, or a fresh render on the export pool that is
+    then cached. The flag is True on a cache hit. Raises ExportBusy.
+    """
+    rendered = await export_cache.get(key, doc_type)
+    if rendered is not None:
+        return rendered, True
+    rendered = await export_renderer.render(snapshot, doc_type)
+    await export_cache.set(key, doc_type, rendered)
+    return rendered, False
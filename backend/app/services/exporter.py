@@ -0,0 +1,414 @@
+"""
+Rendering projects to Word and PowerPoint files
+
+Building documents with python-docx/python-pptx is CPU-bound, so it runs on
+a dedicated, size-limited pool (EXPORT_EXECUTOR / EXPORT_WORKERS) instead of
+the event loop. Routes hand over a compact snapshot of the project: title,
+topic, and the title and text of each outline item. With the process pool,
+the worker sends the file back as bytes; files over EXPORT_SPOOL_MAX_BYTES
+come back as a temp file path, which is removed again as soon as it is opened.
+
+Word documents are assembled from per-section OOXML fragments. Each
+section's heading and paragraphs are rendered once, serialized and kept in
+the parent process, keyed by a hash of the section's title and text. Later
+exports copy the unchanged sections in as XML and only build the changed
+ones, which is most of the work in a long report.
+
+In-process rendering writes into a SpooledTemporaryFile. Documents up to
+EXPORT_SPOOL_MAX_BYTES never touch the disk; larger ones spill to an
+anonymous temporary file that the OS reclaims when it is closed.
+
+The response streams the result in EXPORT_CHUNK_SIZE pieces and closes it
+once sent, or when the client goes away; nothing is left behind in /tmp.
+"""
+import copy
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+from urllib.parse import quote
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsmap, qn
+from fastapi.responses import StreamingResponse
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Pt
+from starlette.background import BackgroundTask
+
+from ..config import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_SPOOL_MAX_BYTES,
+    EXPORT_EXECUTOR,
+    EXPORT_WORKERS,
+    EXPORT_MAX_QUEUE,
+    EXPORT_FRAGMENT_CACHE_BYTES,
+)
+from ..worker_pool import WorkerPool, WorkerPoolBusy
+
+# Part of every export cache key: bump whenever the renderers change their output
+TEMPLATE_VERSION = 1
+
+MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+
+def export_snapshot(project) -> Dict[str, Any]:
+    """
+    Everything a renderer needs from a project, as plain data: outline order,
+    titles and section text (None for sections without content)
+    """
+    # Imported here so worker processes do not load the LLM service modules
+    from .generation import section_key, section_title
+
+    content = project.content or {}
+    sections = []
+    for item in project.outline or []:
+        section = content.get(section_key(item))
+        sections.append([section_title(item), section.get("content", "") if section is not None else None])
+    return {"title": project.title, "topic": project.topic, "sections": sections}
+
+
+def fragment_key(section_title: str, content_text: Optional[str]) -> str:
+    """Cache key of a docx section fragment"""
+    payload = json.dumps([TEMPLATE_VERSION, section_title, content_text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_docx(snapshot: Dict[str, Any], out: BinaryIO, fragments: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
+    """
+    Sections found in `fragments` are copied in as pre-rendered XML instead of
+    being built again. Returns the fragments of the sections built this time
+    (none when `fragments` is None, i.e. fragment caching is off).
+    """
+    doc = Document()
+    body = doc.element.body
+    capture = fragments is not None
+    fragments = fragments or {}
+    rendered: Dict[str, bytes] = {}
+
+    # Add title
+    doc.add_heading(snapshot["title"], 0)
+
+    # Add topic if available
+    if snapshot["topic"]:
+        doc.add_paragraph(f"Topic: {snapshot['topic']}")
+        doc.add_paragraph("")  # Empty line
+
+    # Add sections
+    for section_title, content_text in snapshot["sections"]:
+        key = fragment_key(section_title, content_text)
+        fragment = fragments.get(key) or rendered.get(key)
+        if fragment is not None:
+            # Block content always goes before the trailing section properties
+            sect_pr = body.find(qn("w:sectPr"))
+            for element in list(parse_xml(fragment)):
+                sect_pr.addprevious(element)
+            continue
+
+        start = len(body) - 1
+        doc.add_heading(section_title, level=1)
+        if content_text is not None:
+            doc.add_paragraph(content_text)
+        doc.add_paragraph("")  # Empty line between sections
+
+        if not capture:
+            continue
+        wrapper = etree.Element(qn("w:fragment"), nsmap={"w": nsmap["w"]})
+        for element in list(body)[start:-1]:
+            wrapper.append(copy.deepcopy(element))
+        rendered[key] = etree.tostring(wrapper)
+
+    doc.save(out)
+    return rendered
+
+
+def render_pptx(snapshot: Dict[str, Any], out: BinaryIO, fragments: Optional[Dict[str, bytes]] = None) -> Dict[str, bytes]:
+    """Slides are always built in full; a deck has far fewer of them than a report has sections"""
+    prs = Presentation()
+
+    # Add title slide
+    slide = prs.slides.add_slide(prs.slide_layouts[0])
+    slide.shapes.title.text = snapshot["title"]
+    if snapshot["topic"]:
+        slide.placeholders[1].text = snapshot["topic"]
+
+    # Add content slides (Title and Content layout)
+    bullet_slide_layout = prs.slide_layouts[1]
+    for section_title, content_text in snapshot["sections"]:
+        slide = prs.slides.add_slide(bullet_slide_layout)
+        slide.shapes.title.text = section_title
+
+        tf = slide.shapes.placeholders[1].text_frame
+        tf.text = ""  # Clear default text
+
+        if content_text is not None:
+            # One bullet point per non-empty line
+            first = True
+            for para in content_text.split('\n'):
+                if para.strip():
+                    if first:
+                        tf.text = para.strip()
+                        first = False
+                    else:
+                        p = tf.add_paragraph()
+                        p.text = para.strip()
+                        p.level = 0
+                        p.font.size = Pt(14)
+
+    prs.save(out)
+    return {}
+
+
+RENDERERS = {"docx": render_docx, "pptx": render_pptx}
+
+
+class FragmentCache:
+    """LRU of rendered docx section fragments, bounded by their total size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._fragments: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, snapshot: Dict[str, Any]) -> Dict[str, bytes]:
+        """The cached fragments of a snapshot's sections"""
+        found = {}
+        for section_title, content_text in snapshot["sections"]:
+            key = fragment_key(section_title, content_text)
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+                continue
+            self._fragments.move_to_end(key)
+            found[key] = fragment
+            self.hits += 1
+        return found
+
+    def store(self, fragments: Dict[str, bytes]) -> None:
+        for key, fragment in fragments.items():
+            if len(fragment) > self.max_bytes:
+                continue
+            self._bytes += len(fragment) - len(self._fragments.pop(key, b""))
+            self._fragments[key] = fragment
+        while self._bytes > self.max_bytes:
+            _, fragment = self._fragments.popitem(last=False)
+            self._bytes -= len(fragment)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fragments": len(self._fragments),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+fragment_cache = FragmentCache(max_bytes=EXPORT_FRAGMENT_CACHE_BYTES)
+
+
+class RenderedExport:
+    """A rendered file ready to stream; close() releases it (and any temp file)"""
+
+    def __init__(self, file: BinaryIO, size: int, path: Optional[str] = None):
+        self.file = file
+        self.size = size
+        self.path = path
+        # Set when rendered on the export pool (not for cached files)
+        self.wait_ms: Optional[float] = None
+        self.render_ms: Optional[float] = None
+
+    @classmethod
+    def from_path(cls, path: str, size: int) -> "RenderedExport":
+        f = open(path, "rb")
+        try:
+            # POSIX keeps the open file readable; nothing can leak after this
+            os.unlink(path)
+            path = None
+        except OSError:
+            pass  # Windows cannot remove an open file; close() does it
+        return cls(f, size, path)
+
+    def close(self) -> None:
+        self.file.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def _render_spool(snapshot: Dict[str, Any], doc_type: str, fragments: Optional[Dict[str, bytes]] = None):
+    """Returns (rewound spool, size, newly rendered fragments)"""
+    spool = SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, suffix=f".{doc_type}")
+    try:
+        rendered = RENDERERS[doc_type](snapshot, spool, fragments)
+    except BaseException:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size, rendered
+
+
+def render(snapshot: Dict[str, Any], doc_type: str) -> RenderedExport:
+    """Render a snapshot in this process into a spooled buffer, rewound and ready to stream"""
+    spool, size, _ = _render_spool(snapshot, doc_type)
+    return RenderedExport(spool, size)
+
+
+# ------------------------
+# Worker-pool rendering (see app/worker_pool.py)
+# ------------------------
+
+def _pool_warmup() -> None:
+    """Start a worker (and its python-docx/python-pptx imports) ahead of the first export"""
+
+
+def _pool_render(snapshot: Dict[str, Any], doc_type: str, fragments: Optional[Dict[str, bytes]]):
+    """Small files come back as bytes, large ones as a temp file path for the caller to remove"""
+    started = time.time()
+    spool, size, rendered = _render_spool(snapshot, doc_type, fragments)
+    with spool:
+        if size <= EXPORT_SPOOL_MAX_BYTES:
+            payload = spool.read()
+        else:
+            with NamedTemporaryFile(delete=False, suffix=f".{doc_type}") as f:
+                shutil.copyfileobj(spool, f)
+                payload = f.name
+    return ((payload, size), rendered), started, time.time()
+
+
+def _thread_render(snapshot: Dict[str, Any], doc_type: str, fragments: Optional[Dict[str, bytes]]):
+    started = time.time()
+    spool, size, rendered = _render_spool(snapshot, doc_type, fragments)
+    return (RenderedExport(spool, size), rendered), started, time.time()
+
+
+def _discard_result(future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()[0][0]
+    if isinstance(result, RenderedExport):
+        result.close()
+    elif isinstance(result[0], str):
+        RenderedExport.from_path(*result).close()
+
+
+class ExportBusy(WorkerPoolBusy):
+    """Raised when the export queue is full"""
+
+
+class ExportRenderer(WorkerPool):
+    """
+    Renders exports on a dedicated, size-limited pool so building a big
+    document never blocks the event loop, and exports scale across cores.
+    """
+
+    name = "export"
+    busy_error = ExportBusy
+    busy_message = "Too many exports in progress"
+    warmup = staticmethod(_pool_warmup)
+
+    def __init__(self, workers: int, kind: str, max_queue: int):
+        super().__init__(workers, kind, max_queue)
+        self.bytes = 0
+        self.spilled = 0
+
+    async def render(self, snapshot: Dict[str, Any], doc_type: str) -> RenderedExport:
+        # Word sections rendered before are sent along and copied in as XML
+        fragments = fragment_cache.lookup(snapshot) if doc_type == "docx" and fragment_cache.max_bytes else None
+        fn = _pool_render if self.kind == "process" else _thread_render
+        # If the request goes away mid-render, the file is released once the worker is done with it
+        (result, rendered), wait, run = await self.submit(
+            fn, snapshot, doc_type, fragments, on_abandon=_discard_result
+        )
+
+        if fragments is not None:
+            fragment_cache.store(rendered)
+        if self.kind == "process":
+            payload, size = result
+            if isinstance(payload, bytes):
+                result = RenderedExport(io.BytesIO(payload), size)
+            else:
+                result = RenderedExport.from_path(payload, size)
+
+        result.wait_ms = wait * 1000
+        result.render_ms = run * 1000
+        self.bytes += result.size
+        if result.size > EXPORT_SPOOL_MAX_BYTES:
+            self.spilled += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "bytes": self.bytes,
+            "spilled_to_disk": self.spilled,
+            "docx_fragments": fragment_cache.stats(),
+        }
+
+
+export_renderer = ExportRenderer(
+    workers=EXPORT_WORKERS,
+    kind=EXPORT_EXECUTOR,
+    max_queue=EXPORT_MAX_QUEUE,
+)
+
+
+def _iter_file(result: RenderedExport) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = result.file.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        result.close()
+
+
+def export_filename(title: str, doc_type: str) -> str:
+    return f"{title.replace(' ', '_')}.{doc_type}"
+
+
+def content_disposition(filename: str) -> str:
+    """Same Content-Disposition as FileResponse, including non-ASCII titles"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def export_response(result: RenderedExport, doc_type: str, filename: str, headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Stream a rendered export as a download; it is closed however the response ends"""
+    headers = {
+        "Content-Disposition": content_disposition(filename),
+        "Content-Length": str(result.size),
+        **(headers or {}),
+    }
+    if result.render_ms is not None:
+        headers["X-Export-Queue-Ms"] = f"{result.wait_ms:.1f}"
+        headers["X-Export-Render-Ms"] = f"{result.render_ms:.1f}"
+
+    return StreamingResponse(
+        _iter_file(result),
+        media_type=MEDIA_TYPES[doc_type],
+        headers=headers,
+        # Also runs when the client disconnected before the body was read
+        background=BackgroundTask(result.close),
+    )
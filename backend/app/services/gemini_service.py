@@ -1,55 +1,172 @@
-import os
-import requests
-from ..config import OPENROUTER_API_KEY
-
-# Check if OpenRouter API key is configured
-_configured = False
-if OPENROUTER_API_KEY:
-    _configured = True
+import json
+import asyncio
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from .llm_backend import llm_backend
+from .llm_cache import llm_cache, make_key
+from .scheduler import PRIORITY_NAMES, current_llm_context, llm_scheduler
+from .model_router import model_router
+from .prompt_budget import PARAGRAPH_BREAK, prompt_budget
+from .resilience import (
+    LLMServiceError,
+    call_with_retries,
+    handle_failure,
+    openrouter_breaker,
+    openrouter_retry,
+)
+
+# Check if the LLM backend is configured (OpenRouter needs an API key, the local backend does not)
+_configured = llm_backend.configured
+if llm_backend.name == "local":
+    print("🧪 Using the local deterministic LLM backend (LLM_BACKEND=local)")
+elif _configured:
     print("✅ OpenRouter API configured")
 else:
     print("⚠️  Warning: OPENROUTER_API_KEY not set. AI features will not work.")
 
-def _call_openrouter(prompt: str) -> str:
+class _SingleFlight:
+    """
+    Share one upstream call between concurrent callers with the same key.
+    The first caller (leader) starts the call; callers arriving while it is
+    in flight await the same result. The call runs as its own task, so a
+    caller disconnecting does not cancel it for the others.
+
+    The call runs with the leader's priority, so callers only share it within
+    one priority class and with the same cache setting (see _flight_key).
+    """
+    
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.create_task(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Mark the outcome as retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+single_flight = _SingleFlight()
+
+def _flight_key(prompt: str, use_cache: bool) -> str:
+    # An interactive caller must not wait behind a bulk leader in the scheduler,
+    # and a use_cache=False caller must not share a call made on the cached path
+    priority, _ = current_llm_context()
+    mode = "cached" if use_cache else "fresh"
+    return f"{make_key(model_router.primary, prompt)}:{PRIORITY_NAMES[priority]}:{mode}"
+
+async def _call_openrouter(prompt: str, use_cache: bool = True) -> str:
     """
-    Call OpenRouter API to generate text
+    Generate text through the configured LLM backend (OpenRouter by default).
+    Successful responses are cached; pass use_cache=False to skip the lookup.
+    Identical prompts already in flight at the same priority share that call
+    instead of starting another.
     """
-    if not OPENROUTER_API_KEY or not _configured:
+    if not _configured:
         raise Exception("OPENROUTER_API_KEY not configured")
     
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "http://localhost:8000",  # Optional: for analytics
-        "X-Title": "AI Document Generator"  # Optional: for analytics
-    }
+    cached = await llm_cache.get(model_router.primary, prompt, bypass=not use_cache)
+    if cached is not None:
+        return cached
     
-    data = {
-        "model": "google/gemini-flash-1.5",  # FREE model via OpenRouter
-        "messages": [{"role": "user", "content": prompt}]
-    }
+    return await single_flight.do(_flight_key(prompt, use_cache), lambda: _post_openrouter(prompt))
+
+async def _post_openrouter(prompt: str) -> str:
+    """
+    One non-streaming completion request, hedged across models when the
+    primary is slow and retried on transient failures. The response is cached
+    under the primary model on success.
+    """
+    async def attempt(model: str) -> str:
+        # Downscaled (or rejected with a 413) when the prompt leaves less room in the context window
+        max_tokens = prompt_budget.completion_tokens(prompt, model)
+        # Wait for an upstream slot (interactive calls are served before bulk ones).
+        # The slot is given back between retries.
+        async with llm_scheduler.slot():
+            text, usage = await llm_backend.complete(model, prompt, max_tokens)
+        prompt_budget.record(model, prompt, text, usage)
+        return text
     
-    try:
-        response = requests.post(url, headers=headers, json=data, timeout=60)
-        response.raise_for_status()
-        result = response.json()
-        return result["choices"][0]["message"]["content"]
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"OpenRouter API error: {str(e)}")
-    except (KeyError, IndexError) as e:
-        raise Exception(f"Invalid response from OpenRouter API: {str(e)}")
+    text = await call_with_retries(lambda: model_router.call(attempt), openrouter_retry, openrouter_breaker)
+    await llm_cache.set(model_router.primary, prompt, text)
+    return text
 
-def generate_content(topic: str, section_title: str, doc_type: str, existing_content: str = None) -> str:
+async def _stream_openrouter(prompt: str, use_cache: bool = True) -> AsyncIterator[str]:
     """
-    Generate content for a section or slide using OpenRouter API
+    Stream a completion from the LLM backend and yield text deltas as they arrive.
+    A cache hit is yielded as a single chunk; a completed stream is cached.
+    Failures are only retried before the first chunk has been yielded.
+    Streams always use the primary model: a hedge cannot take over text already sent.
     """
-    if not OPENROUTER_API_KEY or not _configured:
-        return f"[Error: OPENROUTER_API_KEY not configured. Please set your OpenRouter API key in the .env file.]\n\nSection: {section_title}\nTopic: {topic}\n\nThis is placeholder content. Please configure your OPENROUTER_API_KEY to generate real content."
+    if not _configured:
+        raise Exception("OPENROUTER_API_KEY not configured")
     
-    try:
-        if doc_type == "docx":
-            prompt = f"""You are a professional document writer. Write a comprehensive section for a document.
+    cached = await llm_cache.get(model_router.primary, prompt, bypass=not use_cache)
+    if cached is not None:
+        yield cached
+        return
+    
+    model = model_router.primary
+    max_tokens = prompt_budget.completion_tokens(prompt, model)
+    
+    chunks = []
+    usage = None
+    attempt = 0
+    while True:
+        openrouter_breaker.allow()
+        try:
+            # The slot is held for the whole stream
+            async with llm_scheduler.slot():
+                events = llm_backend.stream(model, prompt, max_tokens)
+                try:
+                    async for delta, reported in events:
+                        usage = reported or usage
+                        if delta:
+                            chunks.append(delta)
+                            yield delta
+                finally:
+                    # Close the upstream response right away if our consumer went away
+                    await events.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            openrouter_breaker.release_probe()
+            raise
+        except Exception as e:
+            # Text already sent to the client cannot be taken back
+            await handle_failure(e, attempt, openrouter_retry, openrouter_breaker, can_retry=not chunks)
+            attempt += 1
+        else:
+            openrouter_breaker.record_success()
+            break
+    
+    text = "".join(chunks)
+    prompt_budget.record(model, prompt, text, usage)
+    await llm_cache.set(model, prompt, text)
+
+def _build_content_prompt(topic: str, section_title: str, doc_type: str, existing_content: str = None) -> str:
+    """
+    Build the generation prompt for a section or slide
+    """
+    if doc_type == "docx":
+        prompt = f"""You are a professional document writer. Write a comprehensive section for a document.
 
 Topic: {topic}
 Section Title: {section_title}
@@ -61,8 +178,8 @@ Write detailed, well-structured content for this section. Include:
 - Conclusion or transition to next section
 
 Write approximately 300-500 words. Make it professional and informative."""
-        else:  # pptx
-            prompt = f"""You are a professional presentation writer. Write content for a PowerPoint slide.
+    else:  # pptx
+        prompt = f"""You are a professional presentation writer. Write content for a PowerPoint slide.
 
 Topic: {topic}
 Slide Title: {section_title}
@@ -73,45 +190,169 @@ Write concise, engaging content for this slide. Include:
 - Actionable insights
 
 Keep it concise (100-200 words) suitable for a presentation slide."""
-        
-        if existing_content:
-            prompt += f"\n\nCurrent content:\n{existing_content}\n\nRefine and improve this content based on the above requirements."
-        
-        return _call_openrouter(prompt)
-    except Exception as e:
-        # Fallback if API fails
-        error_msg = str(e)
-        return f"[Error generating content: {error_msg}]\n\nSection: {section_title}\nTopic: {topic}\n\nPlease check your OPENROUTER_API_KEY and API quota."
+    
+    if existing_content:
+        # Only a reference for the new answer, so it may be trimmed to the budget
+        existing_content = prompt_budget.fit_context(existing_content, doc_type)
+        prompt += f"\n\nCurrent content:\n{existing_content}\n\nRefine and improve this content based on the above requirements."
+    
+    return prompt
 
-def refine_content(original_content: str, refinement_prompt: str, topic: str, section_title: str) -> str:
+def _build_batch_prompt(topic: str, section_titles: List[str], doc_type: str) -> str:
     """
-    Refine existing content based on user prompt using OpenRouter API
+    Build one prompt asking for several sections or slides as a JSON object
     """
-    if not OPENROUTER_API_KEY or not _configured:
-        return f"[Error: OPENROUTER_API_KEY not configured.]\n\n{original_content}"
+    numbered = "\n".join(f"{i}. {title}" for i, title in enumerate(section_titles, start=1))
+    if doc_type == "docx":
+        prompt = f"""You are a professional document writer. Write several sections of one document.
+
+Topic: {topic}
+
+Sections:
+{numbered}
+
+For each section write detailed, well-structured content. Include:
+- Clear introduction to the section
+- Main points and explanations
+- Supporting details
+- Conclusion or transition to next section
+
+Write approximately 300-500 words per section. Make it professional and informative."""
+    else:  # pptx
+        prompt = f"""You are a professional presentation writer. Write content for several PowerPoint slides of one presentation.
+
+Topic: {topic}
+
+Slides:
+{numbered}
+
+For each slide write concise, engaging content. Include:
+- Key points (3-5 bullet points)
+- Brief explanations
+- Actionable insights
+
+Keep each slide concise (100-200 words) suitable for a presentation slide."""
     
+    prompt += """
+
+Return ONLY a JSON object that maps each number above to its content as a string, for example: {"1": "content for 1", "2": "content for 2"}
+
+Do not include any other text, only the JSON object."""
+    return prompt
+
+def _parse_batch_response(text: str, count: int) -> List[Optional[str]]:
+    """
+    Split a batched JSON answer back into per-section content.
+    Sections missing from the answer (or an unparseable answer) come back as None.
+    """
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if not json_match:
+        return [None] * count
     try:
+        data = json.loads(json_match.group())
+    except ValueError:
+        return [None] * count
+    if not isinstance(data, dict):
+        return [None] * count
+    
+    results = []
+    for i in range(1, count + 1):
+        value = data.get(str(i))
+        results.append(value.strip() if isinstance(value, str) and value.strip() else None)
+    return results
+
+def _build_refine_prompts(original_content: str, refinement_prompt: str, topic: str, section_title: str, doc_type: str = "docx") -> List[str]:
+    """
+    Build the refinement prompts for existing content: one, or one per part
+    when the content is over the doc_type budget
+    """
+    # The answer replaces this text, so it is never trimmed; long content is refined in parts
+    parts = prompt_budget.split_rewrite(original_content, doc_type)
+    prompts = []
+    for number, part in enumerate(parts, start=1):
         prompt = f"""You are a professional document editor. Refine the following content based on the user's request.
 
 Topic: {topic}
 Section Title: {section_title}
 Original Content:
-{original_content}
+{part}
 
 User's Refinement Request: {refinement_prompt}
 
 Please refine the content according to the user's request while maintaining the core message and professional tone."""
-        
-        return _call_openrouter(prompt)
-    except Exception as e:
-        error_msg = str(e)
-        return f"[Error refining content: {error_msg}]\n\nOriginal content:\n{original_content}"
+        if len(parts) > 1:
+            prompt += f"\n\nThis is part {number} of {len(parts)} of the section. Return only the refined text of this part, without a heading or introduction."
+        prompts.append(prompt)
+    return prompts
+
+async def generate_content(topic: str, section_title: str, doc_type: str, existing_content: str = None, use_cache: bool = True) -> str:
+    """
+    Generate content for a section or slide using OpenRouter API
+    """
+    if not _configured:
+        return f"[Error: OPENROUTER_API_KEY not configured. Please set your OpenRouter API key in the .env file.]\n\nSection: {section_title}\nTopic: {topic}\n\nThis is placeholder content. Please configure your OPENROUTER_API_KEY to generate real content."
+    
+    # Provider failures raise LLMServiceError (a 503) rather than returning error text
+    prompt = _build_content_prompt(topic, section_title, doc_type, existing_content)
+    return await _call_openrouter(prompt, use_cache=use_cache)
+
+async def generate_content_batch(topic: str, section_titles: List[str], doc_type: str, use_cache: bool = True) -> List[Optional[str]]:
+    """
+    Generate several sections or slides with one completion. Entries are None
+    for sections the answer did not contain; callers generate those one by one.
+    """
+    if not _configured:
+        return [None] * len(section_titles)
+    
+    prompt = _build_batch_prompt(topic, section_titles, doc_type)
+    return _parse_batch_response(await _call_openrouter(prompt, use_cache=use_cache), len(section_titles))
+
+async def stream_content(topic: str, section_title: str, doc_type: str, existing_content: str = None, use_cache: bool = True) -> AsyncIterator[str]:
+    """
+    Stream generated content for a section or slide, chunk by chunk
+    """
+    if not _configured:
+        yield await generate_content(topic, section_title, doc_type, existing_content)
+        return
+    
+    prompt = _build_content_prompt(topic, section_title, doc_type, existing_content)
+    async for chunk in _stream_openrouter(prompt, use_cache=use_cache):
+        yield chunk
 
-def generate_outline(topic: str, doc_type: str) -> list:
+async def refine_content(original_content: str, refinement_prompt: str, topic: str, section_title: str, doc_type: str = "docx", use_cache: bool = True) -> str:
+    """
+    Refine existing content based on user prompt using OpenRouter API
+    """
+    if not _configured:
+        return f"[Error: OPENROUTER_API_KEY not configured.]\n\n{original_content}"
+    
+    prompts = _build_refine_prompts(original_content, refinement_prompt, topic, section_title, doc_type)
+    if len(prompts) == 1:
+        return await _call_openrouter(prompts[0], use_cache=use_cache)
+    parts = await asyncio.gather(*(_call_openrouter(prompt, use_cache=use_cache) for prompt in prompts))
+    return PARAGRAPH_BREAK.join(part.strip() for part in parts)
+
+async def stream_refinement(original_content: str, refinement_prompt: str, topic: str, section_title: str, doc_type: str = "docx", use_cache: bool = True) -> AsyncIterator[str]:
+    """
+    Stream refined content, chunk by chunk
+    """
+    if not _configured:
+        yield await refine_content(original_content, refinement_prompt, topic, section_title)
+        return
+    
+    prompts = _build_refine_prompts(original_content, refinement_prompt, topic, section_title, doc_type)
+    for number, prompt in enumerate(prompts):
+        # Parts are streamed one after another, in order
+        if number:
+            yield PARAGRAPH_BREAK
+        async for chunk in _stream_openrouter(prompt, use_cache=use_cache):
+            yield chunk
+
+async def generate_outline(topic: str, doc_type: str, use_cache: bool = True) -> list:
     """
     Generate outline (sections or slides) using OpenRouter API
     """
-    if not OPENROUTER_API_KEY or not _configured:
+    if not _configured:
         # Return default outline if API key not configured
         if doc_type == "docx":
             return ["Introduction", "Background", "Main Content", "Analysis", "Conclusion"]
@@ -136,12 +377,9 @@ Provide 8-12 slide titles that would make a complete presentation. Return ONLY a
 
 Do not include any other text, only the JSON array."""
         
-        text = _call_openrouter(prompt).strip()
+        text = (await _call_openrouter(prompt, use_cache=use_cache)).strip()
         
         # Try to extract JSON from response
-        import json
-        import re
-        
         # Find JSON array in response
         json_match = re.search(r'\[.*\]', text, re.DOTALL)
         if json_match:
@@ -152,6 +390,8 @@ Do not include any other text, only the JSON array."""
         lines = [line.strip().strip('"').strip("'") for line in text.split('\n') if line.strip()]
         return lines[:12] if doc_type == "pptx" else lines[:7]
         
+    except LLMServiceError:
+        raise
     except Exception as e:
         # Return default outline
         if doc_type == "docx":
@@ -0,0 +1,186 @@
+"""
+Concurrent section generation for whole documents
+
+In batched mode (GENERATION_BATCH_ENABLED) consecutive sections are requested
+together in one JSON completion, so the topic preamble and per-request
+overhead are paid once per batch. Sections a batch answer does not contain
+are generated one by one.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import (
+    GENERATION_CONCURRENCY,
+    GENERATION_BATCH_ENABLED,
+    GENERATION_BATCH_MAX_SECTIONS,
+    LLM_MAX_OUTPUT_TOKENS,
+)
+from ..models import Content, Project
+from .gemini_service import generate_content, generate_content_batch
+from .model_router import model_router
+from .prompt_budget import context_window
+
+# Rough output size of one section, in tokens (300-500 words / 100-200 words plus JSON quoting)
+SECTION_OUTPUT_TOKENS = {"docx": 800, "pptx": 320}
+# Topic, instructions and one outline line per section
+PROMPT_OVERHEAD_TOKENS = 400
+TITLE_TOKENS = 20
+
+batch_stats = {"batches": 0, "batched_sections": 0, "fallback_sections": 0}
+
+
+def section_key(item: Dict[str, Any]) -> str:
+    """Return the content key used for an outline item"""
+    return item.get("id") or item.get("title", "").lower().replace(" ", "_")
+
+
+def section_title(item: Dict[str, Any]) -> str:
+    """Return the display title of an outline item"""
+    return item.get("title", item.get("name", ""))
+
+
+def batch_size(doc_type: str, model: Optional[str] = None) -> int:
+    """
+    Sections per batched completion: as many as fit in the model's output
+    limit and context window, capped at GENERATION_BATCH_MAX_SECTIONS
+    """
+    model = model or model_router.primary
+    per_section = SECTION_OUTPUT_TOKENS.get(doc_type, SECTION_OUTPUT_TOKENS["docx"])
+    by_output = LLM_MAX_OUTPUT_TOKENS // per_section
+    by_context = (context_window(model) - PROMPT_OVERHEAD_TOKENS) // (per_section + TITLE_TOKENS)
+    return max(1, min(GENERATION_BATCH_MAX_SECTIONS, by_output, by_context))
+
+
+def _make_section(item: Dict[str, Any], content_text: str) -> Dict[str, Any]:
+    return {
+        "section_id": section_key(item),
+        "title": section_title(item),
+        "content": content_text,
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+async def generate_sections(
+    topic: str,
+    outline: List[Dict[str, Any]],
+    doc_type: str,
+    concurrency: Optional[int] = None,
+    use_cache: bool = True,
+    on_section: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    batched: Optional[bool] = None,
+    staged: Optional[Dict[str, "asyncio.Task[str]"]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Generate content for every outline item at once, with at most
+    `concurrency` LLM calls in flight. Results are returned in outline order.
+
+    `on_section` is awaited with each result as soon as it is ready.
+    `batched` overrides GENERATION_BATCH_ENABLED. `staged` maps section keys to
+    already running generations (see speculation.py) that are adopted instead
+    of starting new calls.
+    """
+    limit = asyncio.Semaphore(max(1, concurrency or GENERATION_CONCURRENCY))
+    # Filled in by position, so the result keeps outline order whatever finishes first
+    sections: List[Optional[Dict[str, Any]]] = [None] * len(outline)
+
+    async def _finish(index: int, content_text: str) -> None:
+        section = _make_section(outline[index], content_text)
+        sections[index] = section
+        if on_section is not None:
+            await on_section(section)
+
+    async def _generate(index: int) -> None:
+        async with limit:
+            content_text = await generate_content(
+                topic=topic,
+                section_title=section_title(outline[index]),
+                doc_type=doc_type,
+                use_cache=use_cache
+            )
+        await _finish(index, content_text)
+
+    async def _fallback(index: int) -> None:
+        batch_stats["fallback_sections"] += 1
+        await _generate(index)
+
+    async def _adopt(index: int, task: "asyncio.Task[str]") -> None:
+        try:
+            content_text = await task
+        except Exception:
+            # The staged call failed: generate the section normally
+            await _generate(index)
+            return
+        await _finish(index, content_text)
+
+    async def _generate_batch(indexes: List[int]) -> None:
+        async with limit:
+            contents = await generate_content_batch(
+                topic=topic,
+                section_titles=[section_title(outline[i]) for i in indexes],
+                doc_type=doc_type,
+                use_cache=use_cache
+            )
+        batch_stats["batches"] += 1
+        batch_stats["batched_sections"] += sum(1 for c in contents if c is not None)
+        await asyncio.gather(*(
+            _finish(i, content_text) if content_text is not None else _fallback(i)
+            for i, content_text in zip(indexes, contents)
+        ))
+
+    staged = staged or {}
+    tasks = [
+        asyncio.create_task(_adopt(i, staged[section_key(item)]))
+        for i, item in enumerate(outline) if section_key(item) in staged
+    ]
+    pending = [i for i, item in enumerate(outline) if section_key(item) not in staged]
+
+    if batched is None:
+        batched = GENERATION_BATCH_ENABLED
+    if batched:
+        size = batch_size(doc_type)
+        batches = [pending[start:start + size] for start in range(0, len(pending), size)]
+        # A lone trailing section gains nothing from the JSON wrapper
+        tasks += [
+            asyncio.create_task(_generate_batch(indexes) if len(indexes) > 1 else _generate(indexes[0]))
+            for indexes in batches
+        ]
+    else:
+        tasks += [asyncio.create_task(_generate(i)) for i in pending]
+
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # One section failed for good (or we were cancelled): stop the rest
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return sections
+
+
+async def store_generated_sections(db: AsyncSession, project: Project, sections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Replace the project's content with the generated sections and add their
+    Content rows, committing everything in one transaction.
+    """
+    generated_content = {}
+    for section in sections:
+        generated_content[section["section_id"]] = {
+            "title": section["title"],
+            "content": section["content"],
+            "generated_at": section["generated_at"]
+        }
+
+        # Store in Content table
+        db.add(Content(
+            project_id=project.id,
+            section_id=section["section_id"],
+            text=section["content"]
+        ))
+
+    project.content = generated_content
+    await db.commit()
+    return generated_content
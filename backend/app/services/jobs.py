@@ -0,0 +1,242 @@
+"""
+Background document generation jobs
+
+Submitting a job stores it in the generation_jobs table and returns at once.
+Workers generate the pending sections and save each finished section on the
+job row, so progress can be polled and a job interrupted by a restart resumes
+without regenerating the sections it already finished.
+
+A provider outage (an LLMServiceError with status 503, such as an open
+circuit breaker) does not fail the job: it goes back to "queued" and is
+retried after the provider's Retry-After, or after a growing delay, keeping
+the sections it already finished. Permanent errors (a rejected request, a
+prompt that is too large) fail it.
+
+Jobs are processed in-process; run a single API process per database when
+relying on restart recovery.
+"""
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import GENERATION_JOB_WORKERS, GENERATION_JOB_RETRY_DELAY, GENERATION_JOB_MAX_RETRIES
+from ..database import AsyncSessionLocal
+from ..models import GenerationJob, Project
+from .generation import generate_sections, section_key, store_generated_sections
+from .resilience import LLMServiceError
+from .scheduler import llm_request_context, BULK
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Longest wait before a job is retried after a provider outage (seconds)
+MAX_RETRY_DELAY = 300
+
+
+def job_status(job: GenerationJob) -> Dict[str, Any]:
+    """Public view of a job for the polling endpoint"""
+    status = {
+        "job_id": job.id,
+        "project_id": job.project_id,
+        "status": job.status,
+        "completed_sections": job.completed_sections,
+        "total_sections": job.total_sections,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
+    if job.status == COMPLETED:
+        status["content"] = job.results
+    return status
+
+
+class GenerationJobRunner:
+    """Queue plus a fixed number of worker tasks running generation jobs"""
+
+    def __init__(self, workers: int, retry_delay: float = GENERATION_JOB_RETRY_DELAY,
+                 max_retries: int = GENERATION_JOB_MAX_RETRIES):
+        self.workers = max(1, workers)
+        self.retry_delay = retry_delay
+        self.max_retries = max(0, max_retries)
+        # Retries so far per job, and the timers that queue them again
+        self._retries: Dict[str, int] = {}
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Jobs a worker is running right now; a job id queued twice is only run once
+        self._active: Set[str] = set()
+
+    def _start_workers(self) -> bool:
+        """Start the queue and workers; False if they were already running"""
+        if self._tasks:
+            return False
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return True
+
+    async def start(self) -> None:
+        if not self._start_workers():
+            return
+
+        # Pick up jobs interrupted by a shutdown or crash
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GenerationJob.id)
+                .where(GenerationJob.status.in_([QUEUED, RUNNING]))
+                .order_by(GenerationJob.created_at)
+            )
+            for job_id in result.scalars().all():
+                self._queue.put_nowait(job_id)
+
+    async def stop(self) -> None:
+        # Running jobs stay in the "running" state and resume on next start,
+        # like jobs waiting for a retry (they are "queued")
+        tasks = self._tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._retry_tasks.clear()
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, db: AsyncSession, project: Project, use_cache: bool = True) -> GenerationJob:
+        """Create a job for the project's current outline and queue it"""
+        outline = list(project.outline or [])
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            project_id=project.id,
+            user_id=project.user_id,
+            status=QUEUED,
+            topic=project.topic,
+            doc_type=project.doc_type or "docx",
+            outline=outline,
+            results={},
+            total_sections=len(outline),
+            completed_sections=0,
+            use_cache=use_cache,
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        # Started lazily when the app did not call start(); no recovery scan here,
+        # it would queue this job a second time
+        self._start_workers()
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except LLMServiceError as e:
+                retries = self._retries.get(job_id, 0)
+                if e.status_code == 503 and retries < self.max_retries:
+                    await self._retry_later(job_id, retries, e)
+                else:
+                    print(f"❌ Generation job {job_id} failed: {type(e).__name__}: {e}")
+                    await self._mark_failed(job_id, str(e))
+            except Exception as e:
+                print(f"❌ Generation job {job_id} failed: {type(e).__name__}: {e}")
+                await self._mark_failed(job_id, str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _retry_later(self, job_id: str, retries: int, error: LLMServiceError) -> None:
+        """Put the job back to "queued" and queue it again once the provider may be back"""
+        delay = error.retry_after
+        if delay is None:
+            delay = self.retry_delay * (2 ** retries)
+        delay = min(MAX_RETRY_DELAY, delay)
+        self._retries[job_id] = retries + 1
+        print(f"⚠️  Generation job {job_id} paused, retrying in {delay:.0f} s: {error}")
+
+        async with AsyncSessionLocal() as db:
+            job = await db.get(GenerationJob, job_id)
+            if job is None:
+                return
+            job.status = QUEUED
+            job.error = f"Retrying after a provider error: {error}"
+            await db.commit()
+
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            if self._queue is not None:
+                self._queue.put_nowait(job_id)
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _run(self, job_id: str) -> None:
+        if job_id in self._active:
+            return
+        self._active.add(job_id)
+        try:
+            await self._generate(job_id)
+        finally:
+            self._active.discard(job_id)
+
+    async def _generate(self, job_id: str) -> None:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(GenerationJob, job_id)
+            if job is None or job.status in (COMPLETED, FAILED):
+                return
+
+            job.status = RUNNING
+            await db.commit()
+
+            done = dict(job.results or {})
+            pending = [item for item in job.outline if section_key(item) not in done]
+            lock = asyncio.Lock()
+
+            async def save_progress(section: Dict[str, Any]) -> None:
+                # Each finished section is committed on its own so it survives a restart
+                async with lock:
+                    done[section["section_id"]] = section
+                    job.results = dict(done)
+                    job.completed_sections = len(done)
+                    await db.commit()
+
+            with llm_request_context(BULK, job.user_id):
+                await generate_sections(
+                    topic=job.topic,
+                    outline=pending,
+                    doc_type=job.doc_type,
+                    use_cache=job.use_cache,
+                    on_section=save_progress,
+                )
+
+            project = await db.get(Project, job.project_id)
+            if project is None:
+                job.status = FAILED
+                job.error = "Project no longer exists"
+                await db.commit()
+                return
+
+            # Outline order, then one transaction for the project content and the job state
+            sections = [done[section_key(item)] for item in job.outline]
+            job.status = COMPLETED
+            job.error = None
+            await store_generated_sections(db, project, sections)
+            self._retries.pop(job_id, None)
+
+    async def _mark_failed(self, job_id: str, error: str) -> None:
+        self._retries.pop(job_id, None)
+        async with AsyncSessionLocal() as db:
+            job = await db.get(GenerationJob, job_id)
+            if job is not None:
+                job.status = FAILED
+                job.error = error
+                await db.commit()
+
+
+job_runner = GenerationJobRunner(workers=GENERATION_JOB_WORKERS)
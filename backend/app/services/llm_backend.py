@@ -0,0 +1,219 @@
+"""
+Pluggable LLM backends
+
+gemini_service builds prompts and wraps every call in caching, scheduling,
+retries and model routing; the backend only turns one prompt into text.
+LLM_BACKEND selects it:
+
+- "openrouter" (default) posts to the OpenRouter chat completions API.
+- "local" answers in-process with deterministic text derived from the
+  prompt. Outline prompts get a JSON array and batched prompts a JSON object,
+  so every endpoint works end to end without an API key, network access or
+  credits. LOCAL_LLM_LATENCY adds a simulated delay per completion.
+
+fake_openrouter.py serves the same local answers over HTTP, for exercising
+the real client path (timeouts, retries, hedging) under load.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..config import LLM_BACKEND, LOCAL_LLM_LATENCY, OPENROUTER_API_KEY
+from .openrouter_client import get_client
+from .prompt_budget import estimate_tokens
+from .resilience import LLMServiceError
+
+# (text delta, usage): usage is only set on the event that reports it
+StreamEvent = Tuple[Optional[str], Optional[Dict]]
+
+
+class LLMBackend(ABC):
+    """Turns one prompt into a completion; retries and routing happen in the caller"""
+
+    name = "base"
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Tuple[str, Optional[Dict]]:
+        """Return (text, provider-reported usage or None)"""
+
+    @abstractmethod
+    def stream(self, model: str, prompt: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        """Yield (text delta, usage) events; usage comes with the last one when reported"""
+
+
+class OpenRouterBackend(LLMBackend):
+    name = "openrouter"
+
+    @property
+    def configured(self) -> bool:
+        return bool(OPENROUTER_API_KEY)
+
+    def _headers(self) -> dict:
+        return {
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:8000",  # Optional: for analytics
+            "X-Title": "AI Document Generator"  # Optional: for analytics
+        }
+
+    def _payload(self, model: str, prompt: str, max_tokens: int, stream: bool = False) -> dict:
+        data = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+        }
+        if stream:
+            data["stream"] = True
+        return data
+
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Tuple[str, Optional[Dict]]:
+        response = await get_client().post("/chat/completions", headers=self._headers(), json=self._payload(model, prompt, max_tokens))
+        response.raise_for_status()
+        try:
+            result = response.json()
+            return result["choices"][0]["message"]["content"], result.get("usage")
+        except (KeyError, IndexError, ValueError) as e:
+            raise LLMServiceError(f"Invalid response from OpenRouter API: {str(e)}", status_code=502)
+
+    async def stream(self, model: str, prompt: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        data = self._payload(model, prompt, max_tokens, stream=True)
+        async with get_client().stream("POST", "/chat/completions", headers=self._headers(), json=data) as response:
+            response.raise_for_status()
+            # Server-sent events: "data: {json}" lines, ": comment" keep-alives, "data: [DONE]" at the end
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                    if "error" in chunk:
+                        raise LLMServiceError(f"OpenRouter API error: {chunk['error']}", status_code=502)
+                    # Token usage, when reported, arrives with the last chunk
+                    usage = chunk.get("usage")
+                    delta = chunk["choices"][0].get("delta", {}).get("content") if chunk.get("choices") else None
+                except (KeyError, IndexError, ValueError) as e:
+                    raise LLMServiceError(f"Invalid response from OpenRouter API: {str(e)}", status_code=502)
+                if delta or usage:
+                    yield delta, usage
+
+
+# Vocabulary for the local backend's filler prose
+_SUBJECTS = ["This section", "The approach", "Our analysis", "The evidence", "A practical view", "The framework", "Each stage"]
+_VERBS = ["highlights", "examines", "connects", "clarifies", "strengthens", "outlines", "compares"]
+_OBJECTS = [
+    "the main drivers", "the key trade-offs", "measurable outcomes", "the underlying assumptions",
+    "common risks", "the next steps", "the supporting data", "long-term impact",
+]
+_CLOSERS = ["in practice", "for stakeholders", "over time", "at scale", "with clear priorities", "in context"]
+_TITLES = [
+    "Introduction", "Background", "Current Landscape", "Key Concepts", "Challenges", "Opportunities",
+    "Case Study", "Analysis", "Best Practices", "Implementation", "Risks", "Future Outlook",
+    "Recommendations", "Summary", "Conclusion",
+]
+
+
+def _field(prompt: str, name: str) -> Optional[str]:
+    match = re.search(rf"^{name}:\s*(.+)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def _word_range(prompt: str) -> Tuple[int, int]:
+    match = re.search(r"(\d+)-(\d+) words", prompt)
+    return (int(match.group(1)), int(match.group(2))) if match else (150, 250)
+
+
+def _prose(rng: random.Random, topic: str, title: str, words: int) -> str:
+    sentences = []
+    count = 0
+    while count < words:
+        sentence = (
+            f"{rng.choice(_SUBJECTS)} on {title.lower()} {rng.choice(_VERBS)} "
+            f"{rng.choice(_OBJECTS)} of {topic} {rng.choice(_CLOSERS)}."
+        )
+        sentences.append(sentence)
+        count += len(sentence.split())
+    # Paragraphs of four sentences
+    return "\n\n".join(" ".join(sentences[i:i + 4]) for i in range(0, len(sentences), 4))
+
+
+def local_completion(prompt: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Deterministic answer for a prompt built by gemini_service: the same prompt
+    always gives the same text, shaped the way the prompt asks for it
+    """
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    topic = _field(prompt, "Topic") or "the topic"
+
+    if "JSON array" in prompt:
+        match = re.search(r"Provide (\d+)-(\d+)", prompt)
+        count = rng.randint(int(match.group(1)), int(match.group(2))) if match else 5
+        middle = rng.sample(_TITLES[1:-1], min(count - 2, len(_TITLES) - 2))
+        return json.dumps(["Introduction"] + middle + ["Conclusion"])
+
+    low, high = _word_range(prompt)
+    if "JSON object" in prompt:
+        titles: List[str] = re.findall(r"^\d+\.\s+(.+)$", prompt, re.MULTILINE)
+        return json.dumps({
+            str(i): _prose(rng, topic, title, rng.randint(low, high))
+            for i, title in enumerate(titles, start=1)
+        })
+
+    title = _field(prompt, "Section Title") or _field(prompt, "Slide Title") or "this topic"
+    words = rng.randint(low, high)
+    if max_tokens:
+        words = min(words, max(1, int(max_tokens * 0.75)))
+    return _prose(rng, topic, title, words)
+
+
+class LocalBackend(LLMBackend):
+    name = "local"
+
+    def __init__(self, latency: float = 0.0, chunk_words: int = 8):
+        self.latency = latency
+        self.chunk_words = chunk_words
+
+    def _usage(self, prompt: str, text: str) -> Dict:
+        return {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+
+    async def complete(self, model: str, prompt: str, max_tokens: int) -> Tuple[str, Optional[Dict]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = local_completion(prompt, max_tokens)
+        return text, self._usage(prompt, text)
+
+    async def stream(self, model: str, prompt: str, max_tokens: int) -> AsyncIterator[StreamEvent]:
+        text = local_completion(prompt, max_tokens)
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+        # The simulated latency is spread over the chunks, like tokens arriving
+        delay = self.latency / len(chunks) if chunks else 0
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(delay)
+            yield (chunk if i == 0 else " " + chunk), None
+        yield None, self._usage(prompt, text)
+
+
+_BACKENDS = {
+    "openrouter": OpenRouterBackend,
+    "local": lambda: LocalBackend(latency=LOCAL_LLM_LATENCY),
+}
+
+
+def create_backend(name: str) -> LLMBackend:
+    try:
+        return _BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}' (expected one of: {', '.join(_BACKENDS)})")
+
+
+llm_backend = create_backend(LLM_BACKEND)
@@ -0,0 +1,185 @@
+"""
+Prompt/response cache for LLM calls
+
+Two tiers: an in-process LRU in front of an on-disk SQLite store. Entries are
+keyed on a hash of the model and the normalized prompt, expire after a TTL and
+the disk tier is bounded to a maximum number of rows (least recently used rows
+are evicted first).
+"""
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..cache import TTLCache
+from ..config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+    LLM_CACHE_MEMORY_SIZE,
+    LLM_CACHE_MAX_ENTRIES,
+)
+
+_WHITESPACE = re.compile(r"[ \t]+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse insignificant whitespace so trivially different prompts share a key"""
+    lines = [_WHITESPACE.sub(" ", line).strip() for line in prompt.strip().splitlines()]
+    return "\n".join(lines)
+
+
+def make_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class _DiskStore:
+    """SQLite-backed tier; all methods are blocking and run in a worker thread"""
+
+    # Evict in batches rather than on every write
+    EVICT_EVERY = 50
+
+    def __init__(self, path: Path, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(str(self.path), timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " response TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed ON llm_cache (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if created_at + self.ttl <= now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return response
+
+    def set(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        expired = conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,)).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN"
+                " (SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+        self.evictions += expired + max(0, overflow)
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            return count
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LLMCache:
+    """Two-tier prompt/response cache with hit/miss counters"""
+
+    def __init__(self, path: Path, ttl: float, memory_size: int, max_entries: int, enabled: bool = True):
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self.disk = _DiskStore(path, ttl=ttl, max_entries=max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.bypassed = 0
+
+    async def get(self, model: str, prompt: str, bypass: bool = False) -> Optional[str]:
+        if not self.enabled or bypass:
+            self.bypassed += 1
+            return None
+        key = make_key(model, prompt)
+        value = self.memory.get(key)
+        if value is None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, model: str, prompt: str, response: str) -> None:
+        # A bypassed request still refreshes the cache with its new answer
+        if not self.enabled:
+            return
+        key = make_key(model, prompt)
+        self.memory.set(key, response)
+        await asyncio.to_thread(self.disk.set, key, model, response)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "bypassed": self.bypassed,
+            "memory": self.memory.stats(),
+            "disk_evictions": self.disk.evictions,
+        }
+
+    def close(self) -> None:
+        self.disk.close()
+
+
+llm_cache = LLMCache(
+    path=LLM_CACHE_PATH,
+    ttl=LLM_CACHE_TTL,
+    memory_size=LLM_CACHE_MEMORY_SIZE,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    enabled=LLM_CACHE_ENABLED,
+)
@@ -0,0 +1,192 @@
+"""
+Model routing with hedged requests
+
+Calls go to the first model in OPENROUTER_MODELS. Each model keeps a rolling
+window of recent latencies; when the primary has not answered within its own
+p90 (LLM_HEDGE_PERCENTILE), the same request is sent to the next model and
+whichever answers first wins. The other call is cancelled, which also gives
+its scheduler slot back.
+
+Hedging only costs a duplicate call for the slowest ~10% of requests, and
+those are the ones that make a whole document slow.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from ..config import (
+    OPENROUTER_MODELS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_DEFAULT_DELAY,
+    LLM_LATENCY_WINDOW,
+)
+
+
+class LatencyHistogram:
+    """Rolling window of recent call latencies (seconds)"""
+
+    def __init__(self, window: int):
+        self._samples: Deque[float] = deque(maxlen=max(1, window))
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        def ms(p: float) -> Optional[float]:
+            value = self.percentile(p)
+            return None if value is None else round(value * 1000, 1)
+
+        return {"samples": len(self), "p50_ms": ms(50), "p90_ms": ms(90), "p99_ms": ms(99)}
+
+
+class _ModelStats:
+    def __init__(self, window: int):
+        self.latency = LatencyHistogram(window)
+        self.requests = 0
+        self.wins = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "wins": self.wins,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "latency": self.latency.snapshot(),
+        }
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # The losing call may fail after the winner returned; nobody awaits it
+    if not task.cancelled():
+        task.exception()
+
+
+class ModelRouter:
+    """Send a request to the primary model, hedging to the next one past its p90"""
+
+    def __init__(
+        self,
+        models: List[str],
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 90,
+        min_samples: int = 20,
+        default_delay: float = 10,
+        window: int = 500,
+    ):
+        self.models = list(models)
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._stats = {model: _ModelStats(window) for model in self.models}
+
+    @property
+    def primary(self) -> str:
+        return self.models[0]
+
+    def hedge_delay(self) -> float:
+        """How long the primary may take before a hedged request is sent"""
+        latency = self._stats[self.primary].latency
+        if len(latency) < self.min_samples:
+            return self.default_delay
+        return latency.percentile(self.hedge_percentile)
+
+    async def _timed(self, model: str, request: Callable[[str], Awaitable[Any]]) -> Any:
+        stats = self._stats[model]
+        stats.requests += 1
+        started = time.monotonic()
+        try:
+            result = await request(model)
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            # A call cancelled after losing a hedge took at least this long;
+            # dropping it would hide the very tail we hedge against
+            stats.latency.record(time.monotonic() - started)
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        stats.latency.record(time.monotonic() - started)
+        return result
+
+    def _launch(self, model: str, request: Callable[[str], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.create_task(self._timed(model, request))
+        task.add_done_callback(_consume_exception)
+        return task
+
+    async def call(self, request: Callable[[str], Awaitable[Any]]) -> Any:
+        """
+        Run `request(model)` on the primary model, hedged onto the second one
+        when the primary is slow. Returns the first successful result; raises
+        the primary's error if every call fails.
+        """
+        primary_task = self._launch(self.primary, request)
+        if not self.hedge_enabled or len(self.models) < 2:
+            result = await primary_task
+            self._stats[self.primary].wins += 1
+            return result
+
+        hedge_task: Optional[asyncio.Task] = None
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_delay())
+            if done:
+                result = primary_task.result()
+                self._stats[self.primary].wins += 1
+                return result
+
+            self.hedges += 1
+            hedge_task = self._launch(self.models[1], request)
+            tasks = {primary_task: self.primary, hedge_task: self.models[1]}
+            pending = set(tasks)
+            errors: Dict[str, BaseException] = {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._stats[tasks[task]].wins += 1
+                        if task is hedge_task:
+                            self.hedge_wins += 1
+                        return task.result()
+                    errors[tasks[task]] = task.exception()
+            raise errors.get(self.primary) or next(iter(errors.values()))
+        finally:
+            # Cancel whichever call lost (or both, if our caller was cancelled)
+            for task in (primary_task, hedge_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "primary": self.primary,
+            "hedge_enabled": self.hedge_enabled and len(self.models) > 1,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "models": {model: stats.snapshot() for model, stats in self._stats.items()},
+        }
+
+
+model_router = ModelRouter(
+    models=OPENROUTER_MODELS,
+    hedge_enabled=LLM_HEDGE_ENABLED,
+    hedge_percentile=LLM_HEDGE_PERCENTILE,
+    min_samples=LLM_HEDGE_MIN_SAMPLES,
+    default_delay=LLM_HEDGE_DEFAULT_DELAY,
+    window=LLM_LATENCY_WINDOW,
+)
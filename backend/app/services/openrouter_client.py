@@ -0,0 +1,74 @@
+"""
+Shared async HTTP client for OpenRouter
+
+One pooled client is created at application startup and reused for every
+LLM call, so requests share keep-alive (and HTTP/2 when available)
+connections instead of opening a new TLS connection each time.
+"""
+from typing import Optional
+
+import httpx
+
+from ..config import (
+    OPENROUTER_BASE_URL,
+    OPENROUTER_TIMEOUT,
+    OPENROUTER_CONNECT_TIMEOUT,
+    OPENROUTER_READ_TIMEOUT,
+    OPENROUTER_MAX_CONNECTIONS,
+    OPENROUTER_MAX_KEEPALIVE,
+    OPENROUTER_HTTP2,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    # The client only ever talks to one host, so the pool limits are
+    # effectively per-host limits for OpenRouter.
+    limits = httpx.Limits(
+        max_connections=OPENROUTER_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENROUTER_MAX_KEEPALIVE,
+    )
+    return httpx.AsyncClient(
+        base_url=OPENROUTER_BASE_URL,
+        limits=limits,
+        # Fail fast on an unreachable host; the read timeout bounds stalls between chunks
+        timeout=httpx.Timeout(
+            OPENROUTER_TIMEOUT,
+            connect=OPENROUTER_CONNECT_TIMEOUT,
+            read=OPENROUTER_READ_TIMEOUT,
+        ),
+        http2=OPENROUTER_HTTP2 and _http2_available(),
+    )
+
+
+async def start_client() -> None:
+    """Create the shared client (called on application startup)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections (called on shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily outside the app (scripts)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
@@ -0,0 +1,204 @@
+"""
+Token budgeting for LLM prompts
+
+Section text embedded in a prompt is kept to a per-doc_type token budget.
+When a section is regenerated, its current content is only a reference for
+the new answer, so fit_context trims it, keeping the start and end of the
+text and dropping the middle. When a section is refined, the answer
+replaces the original, so nothing may be dropped: split_rewrite cuts text
+over the budget into parts at paragraph breaks, each part is refined on
+its own and the answers are joined in order.
+
+Before a prompt is sent, its size plus the requested completion is checked
+against the model's context window. If the two do not fit, max_tokens is
+downscaled. If even LLM_MIN_OUTPUT_TOKENS do not fit, the prompt is rejected
+with PromptTooLargeError (a 413) instead of failing upstream.
+
+Token counts use tiktoken when it is installed and a character/word
+heuristic otherwise. Actual prompt/completion usage reported by the
+provider is recorded per model.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+from ..config import (
+    LLM_CONTEXT_WINDOW,
+    LLM_CONTEXT_WINDOWS,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_MIN_OUTPUT_TOKENS,
+    PROMPT_CONTEXT_BUDGETS,
+)
+
+TRIM_MARKER = "\n\n[...]\n\n"
+PARAGRAPH_BREAK = "\n\n"
+
+
+def _load_encoder():
+    """tiktoken is optional; without it token counts are estimated"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+_encoder = _load_encoder()
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    if _encoder is not None:
+        return len(_encoder.encode(text))
+    # ~4 characters per token for English prose; word count catches short-word text
+    return max(math.ceil(len(text) / 4), math.ceil(len(text.split()) * 1.3))
+
+
+def context_window(model: str) -> int:
+    return LLM_CONTEXT_WINDOWS.get(model, LLM_CONTEXT_WINDOW)
+
+
+class PromptTooLargeError(Exception):
+    """The prompt leaves no room for a useful completion; surfaced as a 413"""
+
+    def __init__(self, prompt_tokens: int, limit: int, message: Optional[str] = None):
+        super().__init__(message or (
+            f"Prompt is too large for the model ({prompt_tokens} tokens, limit {limit}). "
+            "Shorten the content or the request."
+        ))
+        self.prompt_tokens = prompt_tokens
+        self.limit = limit
+
+
+class _ModelUsage:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_calls = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "estimated_calls": self.estimated_calls,
+        }
+
+
+class PromptBudget:
+    """Trims embedded context, sizes completions and records token usage"""
+
+    def __init__(self):
+        self.trimmed = 0
+        self.trimmed_tokens = 0
+        self.downscaled = 0
+        self.rejected = 0
+        self.split_rewrites = 0
+        self.rewrite_parts = 0
+        self._usage: Dict[str, _ModelUsage] = {}
+
+    def context_budget(self, doc_type: Optional[str]) -> int:
+        return PROMPT_CONTEXT_BUDGETS.get(doc_type or "docx", PROMPT_CONTEXT_BUDGETS["docx"])
+
+    def fit_context(self, text: Optional[str], doc_type: Optional[str]) -> Optional[str]:
+        """
+        Trim reference text to the doc_type budget, keeping its start and end.
+        Not for text the answer is written back over: use split_rewrite.
+        """
+        budget = self.context_budget(doc_type)
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            return text
+
+        words = text.split(" ")
+        keep = max(1, int(len(words) * budget / tokens))
+        head = words[:math.ceil(keep * 2 / 3)]
+        tail = words[len(words) - (keep - len(head)):] if keep > len(head) else []
+        trimmed = " ".join(head) + TRIM_MARKER + " ".join(tail)
+
+        self.trimmed += 1
+        self.trimmed_tokens += tokens - estimate_tokens(trimmed)
+        return trimmed
+
+    def split_rewrite(self, text: Optional[str], doc_type: Optional[str]) -> List[Optional[str]]:
+        """
+        Cut text whose rewrite replaces it into parts within the doc_type
+        budget, at paragraph breaks (a paragraph over the budget on its own is
+        cut between words). The parts hold all of the text, in order; text
+        within the budget is a single part.
+        """
+        budget = self.context_budget(doc_type)
+        if estimate_tokens(text) <= budget:
+            return [text]
+
+        # (text, tokens, separator before it in the original)
+        pieces = []
+        for paragraph in text.split(PARAGRAPH_BREAK):
+            tokens = estimate_tokens(paragraph)
+            if tokens <= budget:
+                pieces.append((paragraph, tokens, PARAGRAPH_BREAK))
+                continue
+            words = paragraph.split(" ")
+            size = max(1, int(len(words) * budget / tokens))
+            for start in range(0, len(words), size):
+                piece = " ".join(words[start:start + size])
+                pieces.append((piece, estimate_tokens(piece), PARAGRAPH_BREAK if start == 0 else " "))
+
+        parts: List[Optional[str]] = []
+        current = ""
+        current_tokens = 0
+        for piece, tokens, separator in pieces:
+            if current_tokens and current_tokens + tokens > budget:
+                parts.append(current)
+                current, current_tokens = "", 0
+            current = current + separator + piece if current_tokens else piece
+            current_tokens += tokens
+        parts.append(current)
+
+        self.split_rewrites += 1
+        self.rewrite_parts += len(parts)
+        return parts
+
+    def completion_tokens(self, prompt: str, model: str) -> int:
+        """
+        max_tokens to request for this prompt: LLM_MAX_OUTPUT_TOKENS, or less
+        if the context window cannot hold that much. Raises PromptTooLargeError
+        when not even LLM_MIN_OUTPUT_TOKENS fit.
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        limit = context_window(model)
+        room = limit - prompt_tokens
+        if room < LLM_MIN_OUTPUT_TOKENS:
+            self.rejected += 1
+            raise PromptTooLargeError(prompt_tokens, limit)
+        if room < LLM_MAX_OUTPUT_TOKENS:
+            self.downscaled += 1
+            return room
+        return LLM_MAX_OUTPUT_TOKENS
+
+    def record(self, model: str, prompt: str, completion: str, usage: Optional[Dict[str, Any]] = None) -> None:
+        """Record token usage of a finished call, estimating what the provider did not report"""
+        stats = self._usage.setdefault(model, _ModelUsage())
+        stats.calls += 1
+        usage = usage or {}
+        if "prompt_tokens" not in usage or "completion_tokens" not in usage:
+            stats.estimated_calls += 1
+        stats.prompt_tokens += int(usage.get("prompt_tokens") or estimate_tokens(prompt))
+        stats.completion_tokens += int(usage.get("completion_tokens") or estimate_tokens(completion))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokenizer": "tiktoken" if _encoder is not None else "estimate",
+            "context_budgets": PROMPT_CONTEXT_BUDGETS,
+            "trimmed_contexts": self.trimmed,
+            "trimmed_tokens": self.trimmed_tokens,
+            "downscaled": self.downscaled,
+            "rejected": self.rejected,
+            "split_rewrites": self.split_rewrites,
+            "rewrite_parts": self.rewrite_parts,
+            "usage": {model: usage.snapshot() for model, usage in self._usage.items()},
+        }
+
+
+prompt_budget = PromptBudget()
@@ -0,0 +1,238 @@
+"""
+Retries and circuit breaking for upstream LLM calls
+
+Transient failures (connection errors, timeouts, 429 and 5xx responses) are
+retried a bounded number of times with jittered exponential backoff, honouring
+the provider's Retry-After header. A circuit breaker counts consecutive
+failures; once it opens, calls fail immediately with LLMServiceError until a
+single probe request succeeds again.
+
+Routes do not catch LLMServiceError: main.py turns it into a 503 response with
+Retry-After, so error text is never saved as document content.
+"""
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from ..config import (
+    LLM_RETRY_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LLMServiceError(Exception):
+    """The LLM provider could not produce a response; surfaced as a 503"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, status_code: int = 503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class CircuitOpenError(LLMServiceError):
+    """Raised without calling the provider while the breaker is open"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After as seconds; accepts delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    # Connect/read/write/pool timeouts, refused connections, dropped streams
+    return isinstance(exc, httpx.TransportError)
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return parse_retry_after(exc.response.headers.get("Retry-After"))
+    return None
+
+
+def describe(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"HTTP {exc.response.status_code}"
+    return f"{type(exc).__name__}: {exc}" if str(exc) else type(exc).__name__
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        if self.state == OPEN and self.retry_in() <= 0:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(
+            f"LLM provider unavailable ({self.last_error}); not retrying for now",
+            retry_after=self.retry_in() or 1.0,
+        )
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self, error: str) -> None:
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = self._clock()
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """A half-open probe ended without a verdict (e.g. a non-retryable 4xx)"""
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_s": round(self.retry_in(), 2) if self.state == OPEN else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, attempts: int, base_delay: float, max_delay: float):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.exhausted = 0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to sleep before attempt `attempt + 1`, or None when the caller
+        should give up (no attempts left, or Retry-After exceeds max_delay)
+        """
+        if attempt + 1 >= self.attempts:
+            return None
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+        }
+
+
+async def handle_failure(
+    exc: Exception,
+    attempt: int,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    can_retry: bool = True,
+) -> None:
+    """
+    Record a failed attempt, then either sleep until the next attempt may
+    start or raise. Must be called from the `except` block handling `exc`.
+    """
+    if not is_retryable(exc):
+        breaker.release_probe()
+        if isinstance(exc, httpx.HTTPStatusError):
+            raise LLMServiceError(f"LLM provider rejected the request ({describe(exc)})", status_code=502) from exc
+        raise exc
+
+    breaker.record_failure(describe(exc))
+    retry_after = retry_after_of(exc)
+    wait = policy.delay(attempt, retry_after) if can_retry else None
+    if wait is None or breaker.state == OPEN:
+        policy.exhausted += 1
+        raise LLMServiceError(
+            f"LLM provider unavailable ({describe(exc)})",
+            retry_after=retry_after if retry_after is not None else (breaker.retry_in() or None),
+        ) from exc
+    policy.retries += 1
+    await asyncio.sleep(wait)
+
+
+async def call_with_retries(
+    fn: Callable[[], Awaitable[Any]],
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+) -> Any:
+    """
+    Run `fn` under the breaker, retrying transient failures. Provider
+    failures that persist are raised as LLMServiceError.
+    """
+    attempt = 0
+    while True:
+        breaker.allow()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            await handle_failure(e, attempt, policy, breaker)
+            attempt += 1
+        else:
+            breaker.record_success()
+            return result
+
+
+openrouter_retry = RetryPolicy(
+    attempts=LLM_RETRY_ATTEMPTS,
+    base_delay=LLM_RETRY_BASE_DELAY,
+    max_delay=LLM_RETRY_MAX_DELAY,
+)
+openrouter_breaker = CircuitBreaker(
+    failure_threshold=LLM_BREAKER_FAILURES,
+    reset_timeout=LLM_BREAKER_RESET,
+)
@@ -0,0 +1,171 @@
+"""
+Priority scheduler for upstream LLM calls
+
+Every OpenRouter request takes a slot from a global in-flight limit. When the
+limit is reached, callers wait in per-priority queues: interactive work
+(refine, single-section generation, AI outline) is always served before bulk
+work (whole-document generation). Within a priority class, users are served
+round-robin so one user's large batch cannot monopolise the class.
+
+The priority and user of the current request are carried in a context
+variable, set by the route handlers with `llm_request_context`.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+from ..config import LLM_MAX_IN_FLIGHT
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Number of recent waits kept per class for percentile metrics
+WAIT_WINDOW = 1000
+
+_llm_context: ContextVar[Tuple[int, Optional[Hashable]]] = ContextVar(
+    "llm_context", default=(INTERACTIVE, None)
+)
+
+
+@contextmanager
+def llm_request_context(priority: int, user_id: Optional[Hashable] = None):
+    """Tag LLM calls made inside the block with a priority class and user"""
+    token = _llm_context.set((priority, user_id))
+    try:
+        yield
+    finally:
+        _llm_context.reset(token)
+
+
+def current_llm_context() -> Tuple[int, Optional[Hashable]]:
+    return _llm_context.get()
+
+
+class _ClassMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent: Deque[float] = deque(maxlen=WAIT_WINDOW)
+
+    def record(self, wait: float) -> None:
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent.append(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.total_wait / (self.requests or 1) * 1000, 2),
+            "p95_wait_ms": round(p95 * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class LLMScheduler:
+    """Global in-flight limit with priority classes and per-user fair queueing"""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        # priority -> user -> waiters; OrderedDict order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[Hashable, Deque[asyncio.Future]]"] = {
+            priority: OrderedDict() for priority in PRIORITY_NAMES
+        }
+        self._metrics = {priority: _ClassMetrics() for priority in PRIORITY_NAMES}
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues[p] for p in self._queues)
+
+    async def acquire(self, priority: int = INTERACTIVE, user_id: Optional[Hashable] = None) -> None:
+        metrics = self._metrics[priority]
+        if self.in_flight < self.max_in_flight and not self._has_waiters():
+            self.in_flight += 1
+            metrics.record(0.0)
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user_id, deque()).append(waiter)
+        metrics.queued += 1
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.release()
+            else:
+                self._discard(priority, user_id, waiter)
+            raise
+        finally:
+            metrics.queued -= 1
+        metrics.record(time.monotonic() - started)
+
+    def release(self) -> None:
+        waiter = self._next_waiter()
+        if waiter is not None:
+            # Hand the slot straight to the next waiter; in_flight is unchanged
+            waiter.set_result(None)
+        else:
+            self.in_flight -= 1
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            while users:
+                user_id, waiters = users.popitem(last=False)
+                while waiters and waiters[0].done():
+                    waiters.popleft()
+                if not waiters:
+                    continue
+                waiter = waiters.popleft()
+                if waiters:
+                    # Back of the line for this user's remaining requests
+                    users[user_id] = waiters
+                return waiter
+        return None
+
+    def _discard(self, priority: int, user_id: Optional[Hashable], waiter: asyncio.Future) -> None:
+        waiters = self._queues[priority].get(user_id)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._queues[priority][user_id]
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None, user_id: Optional[Hashable] = None):
+        """Hold one in-flight slot; defaults come from llm_request_context"""
+        if priority is None:
+            priority, context_user = current_llm_context()
+            user_id = context_user if user_id is None else user_id
+        await self.acquire(priority, user_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "classes": {
+                PRIORITY_NAMES[priority]: metrics.snapshot()
+                for priority, metrics in self._metrics.items()
+            },
+        }
+
+
+llm_scheduler = LLMScheduler(max_in_flight=LLM_MAX_IN_FLIGHT)
@@ -0,0 +1,164 @@
+"""
+Speculative pre-generation of the first sections after an outline is created
+
+Users almost always click "generate" right after the AI outline appears. When
+SPECULATIVE_GENERATION_ENABLED is set, the first SPECULATIVE_SECTIONS sections
+start generating in the background as soon as the outline is saved. The
+in-flight work is staged per project under a hash of the outline (the
+outline version). /generate and /generate_section adopt the staged sections
+instead of starting new calls.
+
+Editing the outline, topic or document type changes the version. The staged
+work is then cancelled and never handed over. Staging is in-process memory
+only; speculative calls run at bulk priority so they never delay
+interactive requests.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from ..config import SPECULATIVE_GENERATION_ENABLED, SPECULATIVE_SECTIONS, SPECULATIVE_TTL
+from .gemini_service import generate_content
+from .generation import section_key, section_title
+from .scheduler import llm_request_context, BULK
+
+
+def outline_version(topic: Optional[str], doc_type: Optional[str], outline: Optional[List[Dict[str, Any]]]) -> str:
+    """Hash of everything the generated sections depend on"""
+    payload = {
+        "topic": topic or "",
+        "doc_type": doc_type or "docx",
+        "outline": [(item.get("id"), item.get("title", item.get("name", ""))) for item in outline or []],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def project_outline_version(project) -> str:
+    return outline_version(project.topic, project.doc_type, project.outline)
+
+
+class _Stage:
+    def __init__(self, version: str, tasks: Dict[str, asyncio.Task]):
+        self.version = version
+        self.tasks = tasks
+        self.created = time.monotonic()
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Failed speculation is simply not handed over; don't warn about it
+    if not task.cancelled():
+        task.exception()
+
+
+class SpeculativeGenerator:
+    """Per-project staging area for speculatively generated sections"""
+
+    def __init__(self, enabled: bool, sections: int, ttl: float):
+        self.enabled = enabled
+        self.sections = max(0, sections)
+        self.ttl = ttl
+        self._stages: Dict[int, _Stage] = {}
+        self.started = 0
+        self.adopted = 0
+        self.discarded = 0
+
+    def start(self, project_id: int, user_id: int, topic: str, doc_type: str, outline: List[Dict[str, Any]]) -> None:
+        """Start generating the first sections of a freshly saved outline"""
+        if not self.enabled or not self.sections or not topic:
+            return
+        self._expire()
+        self.discard(project_id)
+
+        tasks = {}
+        # Tasks copy the current context, so the calls are queued as bulk work
+        with llm_request_context(BULK, user_id):
+            for item in outline[:self.sections]:
+                task = asyncio.create_task(generate_content(
+                    topic=topic,
+                    section_title=section_title(item),
+                    doc_type=doc_type or "docx",
+                ))
+                task.add_done_callback(_consume_exception)
+                tasks[section_key(item)] = task
+        self.started += len(tasks)
+        self._stages[project_id] = _Stage(outline_version(topic, doc_type, outline), tasks)
+
+    def claim_all(self, project_id: int, version: str) -> Dict[str, asyncio.Task]:
+        """Take every staged section of a project, if it matches the outline version"""
+        stage = self._stages.pop(project_id, None)
+        if stage is None:
+            return {}
+        if stage.version != version:
+            self._cancel(stage.tasks.values())
+            return {}
+        self.adopted += len(stage.tasks)
+        return stage.tasks
+
+    async def claim(self, project_id: int, version: str, section_id: str) -> Optional[str]:
+        """
+        Take one staged section, waiting for it if it is still generating.
+        Returns None if nothing usable is staged.
+        """
+        stage = self._stages.get(project_id)
+        if stage is None:
+            return None
+        if stage.version != version:
+            self.discard(project_id)
+            return None
+        task = stage.tasks.pop(section_id, None)
+        if not stage.tasks:
+            del self._stages[project_id]
+        if task is None:
+            return None
+        self.adopted += 1
+        try:
+            # Shielded: if this request goes away the result still lands in the LLM cache
+            return await asyncio.shield(task)
+        except Exception:
+            return None
+
+    def discard(self, project_id: int) -> None:
+        stage = self._stages.pop(project_id, None)
+        if stage is not None:
+            self._cancel(stage.tasks.values())
+
+    def discard_stale(self, project_id: int, version: str) -> None:
+        """Drop staged work made for a different outline version"""
+        stage = self._stages.get(project_id)
+        if stage is not None and stage.version != version:
+            self.discard(project_id)
+
+    def _cancel(self, tasks) -> None:
+        for task in tasks:
+            # Finished sections were paid for but are wasted all the same
+            self.discarded += 1
+            if not task.done():
+                task.cancel()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for project_id in [pid for pid, stage in self._stages.items() if now - stage.created > self.ttl]:
+            self.discard(project_id)
+
+    def shutdown(self) -> None:
+        for project_id in list(self._stages):
+            self.discard(project_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sections": self.sections,
+            "staged_projects": len(self._stages),
+            "started": self.started,
+            "adopted": self.adopted,
+            "discarded": self.discarded,
+        }
+
+
+speculator = SpeculativeGenerator(
+    enabled=SPECULATIVE_GENERATION_ENABLED,
+    sections=SPECULATIVE_SECTIONS,
+    ttl=SPECULATIVE_TTL,
+)
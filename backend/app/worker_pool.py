@@ -0,0 +1,133 @@
+"""
+Bounded worker pools for CPU-bound work (bcrypt, document rendering)
+
+A WorkerPool runs calls on a dedicated executor of fixed size ("thread" or
+"process"), so the work never blocks the event loop or ties up the
+threadpool that serves the sync routes. Up to `max_queue` calls wait beyond
+the busy workers; past that, submit() raises the pool's busy error and the
+routes answer 503 with Retry-After.
+
+Process pools are spawned, not forked: the server process has a running
+event loop and threads, which a forked child would inherit half-alive.
+
+Functions run on a pool must be module-level so they can be pickled into a
+process pool, and return (result, started, finished) with wall-clock times,
+so queue wait can be told apart from work.
+
+When the caller goes away, a call that has not started yet is cancelled. A
+call that is already running keeps counting against the limit until it
+finishes, so abandoned work cannot push a pool past its bound. (A process
+pool hands one call more than it has workers to its processes ahead of
+time; that call counts as started.)
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+
+class WorkerPoolBusy(Exception):
+    """Raised when a pool's queue is full"""
+
+
+class WorkerPool:
+    # Overridden by subclasses
+    name = "worker"
+    busy_error = WorkerPoolBusy
+    busy_message = "Too many operations in progress"
+    # Module-level function run once per process worker at start, to load its imports early
+    warmup: Optional[Callable[[], None]] = None
+
+    def __init__(self, workers: int, kind: str, max_queue: int):
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        # Calls are released from executor callbacks, which may run on other threads
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self.max_wait = 0.0
+        self.max_run = 0.0
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            if self.warmup is not None:
+                for _ in range(self.workers):
+                    self._executor.submit(self.warmup)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def submit(self, fn: Callable, *args: Any, on_abandon: Optional[Callable] = None) -> Tuple[Any, float, float]:
+        """
+        Run fn(*args) on the pool and return (result, wait seconds, run seconds).
+        on_abandon(future) is called once a call whose caller went away finishes
+        after all, to release its result.
+        """
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise self.busy_error(self.busy_message)
+            self.pending += 1
+        self.start()
+        submitted = time.time()
+        future = self._executor.submit(fn, *args)
+        # Counted until the call has really finished (or was cancelled before it started)
+        future.add_done_callback(self._release)
+        try:
+            result, started, finished = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self.abandoned += 1
+            if not future.cancel() and on_abandon is not None:
+                future.add_done_callback(on_abandon)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+        wait = max(0.0, started - submitted)
+        run = finished - started
+        self._wait_total += wait
+        self._run_total += run
+        self.max_wait = max(self.max_wait, wait)
+        self.max_run = max(self.max_run, run)
+        self.completed += 1
+        return result, wait, run
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "queue_depth": max(0, self.pending - self.workers),
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "avg_wait_ms": round(self._wait_total / done * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_run_ms": round(self._run_total / done * 1000, 2),
+            "max_run_ms": round(self.max_run * 1000, 2),
+        }
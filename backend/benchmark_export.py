@@ -0,0 +1,141 @@
+"""
+Export benchmark
+Measures export latency and peak RSS for 5-, 50- and 500-section documents,
+rendering into the in-memory spool (app/services/exporter.py) versus the old
+NamedTemporaryFile + read-back approach. For docx, "incremental" re-exports
+with one section edited each time and the rest taken from the section
+fragment cache. Every size/format/mode runs in its own subprocess so peak
+RSS is not inflated by earlier runs.
+Run from the backend directory: python benchmark_export.py [runs] [sizes...]
+"""
+import itertools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Add the backend directory to the path
+sys.path.insert(0, BACKEND_DIR)
+
+SIZES = [5, 50, 500]
+MODES = {"docx": ["spooled", "tempfile", "incremental"], "pptx": ["spooled", "tempfile"]}
+# ~400 words per docx section, ~150 words over a few lines per slide
+PARAGRAPH = ("The analysis connects the main drivers of the topic with measurable outcomes "
+             "and highlights the trade-offs that matter to stakeholders over time. ") * 4
+
+
+def make_snapshot(doc_type: str, sections: int) -> dict:
+    if doc_type == "docx":
+        text = "\n\n".join([PARAGRAPH] * 4)
+    else:
+        text = "\n".join([PARAGRAPH[:180]] * 5)
+    return {
+        "title": f"Benchmark {sections}",
+        "topic": "Export performance",
+        "sections": [[f"Section {i + 1}", text] for i in range(sections)],
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def export_spooled(snapshot: dict, doc_type: str) -> int:
+    from app.services.exporter import render, _iter_file
+    # Render, then drain the buffer the way the streaming response does
+    return sum(len(chunk) for chunk in _iter_file(render(snapshot, doc_type)))
+
+
+def export_tempfile(snapshot: dict, doc_type: str) -> int:
+    from app.services.exporter import RENDERERS
+    # Previous behaviour: save to a named temp file, then FileResponse reads it back
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{doc_type}")
+    try:
+        RENDERERS[doc_type](snapshot, temp_file.name)
+        temp_file.close()
+        with open(temp_file.name, "rb") as f:
+            return len(f.read())
+    finally:
+        os.unlink(temp_file.name)
+
+
+def make_incremental():
+    from app.services.exporter import FragmentCache, _render_spool
+    cache = FragmentCache(max_bytes=1 << 30)
+    edits = itertools.count()
+
+    def export_incremental(snapshot: dict, doc_type: str) -> int:
+        # One section changes between exports; the others come from the fragment cache
+        first_title = snapshot["sections"][0][0]
+        snapshot = {**snapshot, "sections": [[first_title, f"Edit {next(edits)}. {PARAGRAPH}"]] + snapshot["sections"][1:]}
+        spool, size, rendered = _render_spool(snapshot, doc_type, cache.lookup(snapshot))
+        cache.store(rendered)
+        spool.close()
+        return size
+
+    return export_incremental
+
+
+def child(doc_type: str, sections: int, mode: str, runs: int) -> None:
+    """Runs in a subprocess; prints one JSON result line"""
+    import app.services.exporter  # noqa: F401  (import cost is not part of the measurement)
+
+    export = {"spooled": export_spooled, "tempfile": export_tempfile}.get(mode) or make_incremental()
+    snapshot = make_snapshot(doc_type, sections)
+    baseline = peak_rss_mb()
+    size = export(snapshot, doc_type)  # warm-up (fills the fragment cache in incremental mode)
+
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        export(snapshot, doc_type)
+        timings.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "median_ms": statistics.median(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - baseline,
+        "size_kb": size / 1024,
+    }))
+
+
+def run_child(doc_type: str, sections: int, mode: str, runs: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", doc_type, str(sections), mode, str(runs)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs: int, sizes: list) -> None:
+    print("=" * 60)
+    print(f"📦 Export benchmark: {runs} runs per size, one process per case")
+    print("=" * 60)
+    print(f"{'format':<7}{'sections':>9}{'mode':>12}{'median ms':>11}{'max ms':>9}{'peak MB':>9}{'+MB':>7}{'file KB':>9}")
+    for doc_type in ("docx", "pptx"):
+        for sections in sizes:
+            for mode in MODES[doc_type]:
+                r = run_child(doc_type, sections, mode, runs if sections < 500 else max(1, runs // 3))
+                print(
+                    f"{doc_type:<7}{sections:>9}{mode:>12}{r['median_ms']:>11.1f}{r['max_ms']:>9.1f}"
+                    f"{r['peak_rss_mb']:>9.1f}{r['rss_growth_mb']:>7.1f}{r['size_kb']:>9.0f}"
+                )
+    print("-" * 60)
+    print("peak MB: process peak RSS; +MB: growth over the RSS after imports")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], int(sys.argv[3]), sys.argv[4], int(sys.argv[5]))
+    else:
+        runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+        sizes = [int(s) for s in sys.argv[2:]] or SIZES
+        main(runs, sizes)
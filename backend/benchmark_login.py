@@ -0,0 +1,103 @@
+"""
+Login lookup benchmark
+Measures the user lookup done by /auth/login against tables of growing size.
+Run from the backend directory: python benchmark_login.py [sizes...]
+
+Example: python benchmark_login.py 1000 10000 100000 1000000
+
+Password verification is left out on purpose: bcrypt costs the same no matter
+how many users exist, so only the email lookup can grow with the table.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import User
+from app.auth.routes import user_by_email_query
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+LOOKUPS = 2_000
+# The old full-scan lookup loads every row, so only run it on small tables
+LEGACY_MAX_USERS = 100_000
+BATCH = 50_000
+
+
+def legacy_lookup(db, normalized_email):
+    """The pre-index implementation: load all users and compare in Python"""
+    for u in db.query(User).all():
+        if u.email.lower().strip() == normalized_email:
+            return u
+    return None
+
+
+def indexed_lookup(db, normalized_email):
+    """The /auth/login lookup"""
+    return db.execute(user_by_email_query(normalized_email)).scalars().first()
+
+
+def populate(engine, count):
+    rows = []
+    with engine.begin() as conn:
+        for i in range(count):
+            rows.append({"full_name": f"User {i}", "email": f"user{i}@example.com", "password": "x"})
+            if len(rows) == BATCH:
+                conn.execute(insert(User), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(User), rows)
+
+
+def time_lookups(Session, lookup, count, iterations):
+    db = Session()
+    try:
+        emails = [f"USER{random.randrange(count)}@Example.com".lower() for _ in range(iterations)]
+        start = time.perf_counter()
+        for email in emails:
+            assert lookup(db, email) is not None
+            db.expunge_all()
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return elapsed / iterations * 1000
+
+
+def run(sizes):
+    print("=" * 60)
+    print("⏱️  Login lookup benchmark")
+    print("=" * 60)
+    print(f"{'users':>10} | {'indexed (ms)':>13} | {'full scan (ms)':>15}")
+    print("-" * 60)
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+            Base.metadata.create_all(bind=engine)
+            populate(engine, size)
+            Session = sessionmaker(bind=engine)
+
+            indexed = time_lookups(Session, indexed_lookup, size, LOOKUPS)
+            if size <= LEGACY_MAX_USERS:
+                iterations = max(3, min(200, 200_000 // size))
+                legacy = f"{time_lookups(Session, legacy_lookup, size, iterations):15.3f}"
+            else:
+                legacy = f"{'skipped':>15}"
+
+            print(f"{size:>10} | {indexed:13.3f} | {legacy}")
+            engine.dispose()
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
@@ -0,0 +1,120 @@
+"""
+SQLite concurrency benchmark
+Compares writer/reader throughput of the "default" and "production" engine
+profiles (see app/database.py) under a refine-like workload.
+Run from the backend directory: python benchmark_sqlite.py [writers] [readers] [seconds]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_sqlite_engine, sqlite_pragmas
+from app.models import User, Project, Refinement
+
+PROJECTS = 50
+
+
+def seed(Session):
+    db = Session()
+    user = User(full_name="Bench", email="bench@example.com", password="x")
+    db.add(user)
+    db.flush()
+    for i in range(PROJECTS):
+        db.add(Project(
+            user_id=user.id,
+            title=f"Project {i}",
+            doc_type="docx",
+            outline=[{"id": "section_1", "title": "Intro"}],
+            content={"section_1": {"title": "Intro", "content": "x" * 2000}}
+        ))
+    db.commit()
+    db.close()
+
+
+def writer(Session, stop, counters, idx):
+    n = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            project = db.get(Project, (n + idx) % PROJECTS + 1)
+            project.content = {"section_1": {"title": "Intro", "content": f"refined {n} " + "x" * 2000}}
+            db.add(Refinement(project_id=project.id, section_id="section_1", prompt="bench", updated_text="y" * 2000))
+            db.commit()
+            counters["writes"] += 1
+        except OperationalError as e:
+            db.rollback()
+            counters["errors"] += 1
+            if "locked" in str(e):
+                counters["locked"] += 1
+        finally:
+            db.close()
+        n += 1
+
+
+def reader(Session, stop, counters, idx):
+    n = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            db.query(Project).filter(Project.id == (n + idx) % PROJECTS + 1).first()
+            db.query(Refinement).filter(Refinement.project_id == (n + idx) % PROJECTS + 1).count()
+            counters["reads"] += 1
+        except OperationalError as e:
+            counters["errors"] += 1
+            if "locked" in str(e):
+                counters["locked"] += 1
+        finally:
+            db.close()
+        n += 1
+
+
+def run_profile(profile, writers, readers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", profile)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(Session)
+
+        counters = {"writes": 0, "reads": 0, "errors": 0, "locked": 0}
+        stop = threading.Event()
+        threads = [threading.Thread(target=writer, args=(Session, stop, counters, i)) for i in range(writers)]
+        threads += [threading.Thread(target=reader, args=(Session, stop, counters, i)) for i in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    return counters
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    print("=" * 70)
+    print(f"🗄️  SQLite benchmark: {writers} writers, {readers} readers, {seconds:g}s per profile")
+    print("=" * 70)
+    print(f"{'profile':>10} | {'writes/s':>9} | {'reads/s':>9} | {'errors':>7} | {'locked':>7}")
+    print("-" * 70)
+    for profile in ("default", "production"):
+        c = run_profile(profile, writers, readers, seconds)
+        print(f"{profile:>10} | {c['writes'] / seconds:9.1f} | {c['reads'] / seconds:9.1f} | {c['errors']:7d} | {c['locked']:7d}")
+    print("=" * 70)
+    print("production pragmas:", sqlite_pragmas("production"))
+
+
+if __name__ == "__main__":
+    main()
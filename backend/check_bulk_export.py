@@ -0,0 +1,126 @@
+"""
+Bulk export check
+Exports a throwaway user's projects through POST /projects/export/bulk: one
+with content, one without, and one whose stored content is malformed. Checks
+that the archive completes within a timeout and that the manifest has an
+error entry for each broken project and none for the good one. The user
+has one project more than EXPORT_BULK_MAX_PROJECTS, so exporting "all" must
+leave the last one out and list it in the manifest; an explicit id list over
+the limit must be rejected with a 400. The projects and user are removed
+again afterwards.
+Run from the backend directory: python check_bulk_export.py
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Add the backend directory to the path
+sys.path.insert(0, BACKEND_DIR)
+
+TIMEOUT = 30
+MAX_PROJECTS = 5
+
+
+def post_with_timeout(client, path: str, headers: dict, body: dict, timeout: float):
+    """A hung export must fail the check, not block it; returns None on timeout"""
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(response=client.post(path, headers=headers, json=body)),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout)
+    return result.get("response")
+
+
+def main() -> bool:
+    from fastapi.testclient import TestClient
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models import User
+
+    print("=" * 60)
+    print("📦 Bulk export check")
+    print("=" * 60)
+    email = f"bulk-check-{time.time()}@example.com"
+    ok = True
+    hung = False
+    with TestClient(app) as client:
+        client.post("/auth/register", json={"full_name": "Bulk Check", "email": email, "password": "bulk-check-password"})
+        token = client.post("/auth/login", json={"email": email, "password": "bulk-check-password"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        outline = [{"id": "s1", "title": "Overview"}]
+        projects = {
+            "good": {"content": {"s1": {"content": "Some text.\n\nMore text."}}},
+            "empty": {"content": {}},
+            # A plain string where a section object belongs: export_snapshot raises on it
+            "malformed": {"content": {"s1": "plain string"}},
+        }
+        # Padding up to one project over the limit; created last, so it is the one left out
+        for i in range(MAX_PROJECTS + 1 - len(projects)):
+            projects[f"extra {i + 1}"] = projects["good"]
+        ids = {}
+        for name, fields in projects.items():
+            response = client.post("/projects/", headers=headers,
+                                   json={"title": f"Bulk {name}", "doc_type": "docx", "outline": outline, **fields})
+            ids[name] = response.json()["id"]
+
+        try:
+            started = time.perf_counter()
+            response = post_with_timeout(client, "/projects/export/bulk", headers, {}, TIMEOUT)
+            if response is None:
+                print(f"❌ Bulk export did not finish within {TIMEOUT} s")
+                hung = True
+                return False
+            print(f"✅ Bulk export finished in {time.perf_counter() - started:.2f} s ({response.status_code})")
+
+            archive = zipfile.ZipFile(io.BytesIO(response.content))
+            manifest = json.loads(archive.read("manifest.json"))
+            entries = {entry["project_id"]: entry for entry in manifest["entries"]}
+            for name, project_id in list(ids.items())[:MAX_PROJECTS]:
+                entry = entries.get(project_id, {})
+                expected = "error" if name in ("empty", "malformed") else "ok"
+                passed = entry.get("status") == expected
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} {name}: {entry.get('status')} {entry.get('error', entry.get('file', ''))}")
+            last = list(ids.values())[-1]
+            passed = manifest["omitted_project_ids"] == [last] and last not in entries
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} over the limit: omitted {manifest['omitted_project_ids']}, "
+                  f"X-Export-Omitted {response.headers.get('x-export-omitted')}")
+            good_file = entries.get(ids["good"], {}).get("file")
+            if good_file not in archive.namelist():
+                print(f"❌ {good_file} missing from the archive")
+                ok = False
+
+            response = client.post("/projects/export/bulk", headers=headers,
+                                   json={"project_ids": list(range(1, MAX_PROJECTS + 2))})
+            passed = response.status_code == 400
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} {MAX_PROJECTS + 1} ids with a limit of {MAX_PROJECTS}: {response.status_code}")
+        finally:
+            for project_id in ids.values():
+                client.delete(f"/projects/{project_id}", headers=headers)
+            with SessionLocal() as db:
+                db.query(User).filter(User.email == email).delete()
+                db.commit()
+            if hung:
+                # Leaving the client would wait for the stuck request forever
+                sys.stdout.flush()
+                os._exit(1)
+    return ok
+
+
+if __name__ == "__main__":
+    # Configure the backend before app.config is imported
+    os.environ.update({
+        "EXPORT_BULK_MAX_PROJECTS": str(MAX_PROJECTS),
+        "EXPORT_CACHE_ENABLED": "false",
+    })
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,123 @@
+"""
+Hedged request check
+Starts fake_openrouter.py with a slow tail on the primary model, then compares
+latency percentiles of generate_content with hedging off and on.
+Run from the backend directory: python check_hedging.py [requests] [concurrency]
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Add the backend directory to the path
+sys.path.insert(0, BACKEND_DIR)
+
+PRIMARY = "fake/primary"
+SECONDARY = "fake/secondary"
+# Primary: 50 ms, but 10% of calls take 2 s. Secondary: a steady 150 ms.
+PRIMARY_LATENCY = f"{PRIMARY}=0.05,0.1,2.0"
+SECONDARY_LATENCY = f"{SECONDARY}=0.15"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(port: int, timeout: float = 10) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("fake OpenRouter server did not start")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run_batch(generate_content, label, count, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with limit:
+            started = time.perf_counter()
+            await generate_content("Hedging", f"{label} section {i} {time.time_ns()}", "docx", use_cache=False)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return latencies
+
+
+async def main(count, concurrency):
+    from app.services.gemini_service import generate_content
+    from app.services.model_router import model_router
+    from app.services.openrouter_client import close_client
+
+    print("=" * 60)
+    print(f"🔀 Hedging check: {count} requests, concurrency {concurrency}")
+    print(f"   primary   {PRIMARY_LATENCY}")
+    print(f"   secondary {SECONDARY_LATENCY}")
+    print("=" * 60)
+
+    # Fill the primary's latency window so the p90 hedge delay is meaningful
+    model_router.hedge_enabled = False
+    await run_batch(generate_content, "warmup", max(50, model_router.min_samples), concurrency)
+
+    results = {}
+    for label, hedge in (("no hedge", False), ("hedged", True)):
+        model_router.hedge_enabled = hedge
+        hedges_before = model_router.hedges
+        latencies = await run_batch(generate_content, label, count, concurrency)
+        results[label] = latencies
+        print(
+            f"{label:>9} | p50 {percentile(latencies, 50) * 1000:7.1f} ms"
+            f" | p90 {percentile(latencies, 90) * 1000:7.1f} ms"
+            f" | p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+            f" | max {max(latencies) * 1000:7.1f} ms"
+            f" | hedges {model_router.hedges - hedges_before}"
+        )
+
+    stats = model_router.stats()
+    print("-" * 60)
+    print(f"hedge delay: {stats['hedge_delay_ms']} ms, hedge wins: {stats['hedge_wins']}")
+    await close_client()
+
+    improved = percentile(results["hedged"], 99) < percentile(results["no hedge"], 99)
+    print("✅ Hedging cut the tail" if improved else "❌ Hedging did not cut the tail")
+    return improved
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "fake_openrouter.py"), "--port", str(port),
+         "--latency", PRIMARY_LATENCY, "--latency", SECONDARY_LATENCY],
+    )
+    try:
+        wait_for_server(port)
+        # Configure the backend before app.config is imported
+        os.environ.update({
+            "OPENROUTER_API_KEY": "fake",
+            "OPENROUTER_BASE_URL": f"http://127.0.0.1:{port}/api/v1",
+            "OPENROUTER_MODELS": f"{PRIMARY},{SECONDARY}",
+            "OPENROUTER_HTTP2": "false",
+            "LLM_CACHE_ENABLED": "false",
+        })
+        ok = asyncio.run(main(count, concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,249 @@
+"""
+Fake OpenRouter server for local testing
+Serves POST /api/v1/chat/completions (plain and `stream: true` server-sent
+events) with deterministic answers from the local LLM backend, plus
+injectable per-model latency and errors. Routing, hedging, retries and load
+tests can then be exercised without an API key or credits.
+
+Run from the backend directory:
+    python fake_openrouter.py [--port 8900] [--latency MODEL=BASE[,TAIL_PROB,TAIL]]
+                              [--distribution MODEL=KIND:A[:B]] [--errors MODEL=RATE[,SHARE_429]] [--seed N]
+
+MODEL may be "*" for every model without its own settings.
+
+Example: the primary answers in 50 ms but 10% of calls take 2 s
+    python fake_openrouter.py --latency google/gemini-flash-1.5=0.05,0.1,2.0
+
+Latency distributions (seconds):
+    fixed:A              always A
+    uniform:A:B          between A and B
+    normal:MEAN:SD       clipped at 0
+    lognormal:MEDIAN:SIGMA
+    exponential:MEAN
+Example: a long-tailed model that fails 2% of calls, half of them with 429
+    python fake_openrouter.py --distribution "*=lognormal:0.8:0.6" --errors "*=0.02,0.5"
+
+Then point the backend at it:
+    OPENROUTER_BASE_URL=http://127.0.0.1:8900/api/v1 OPENROUTER_API_KEY=fake
+
+Settings can also be changed while running:
+    POST /_control/model {"model": "...", "distribution": "uniform", "params": [0.1, 0.3], "error_rate": 0.05}
+    GET  /_control/stats
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.llm_backend import local_completion
+from app.services.prompt_budget import estimate_tokens
+
+app = FastAPI(title="Fake OpenRouter")
+
+DEFAULTS = {
+    "distribution": "fixed",
+    "params": [0.05],
+    "tail_probability": 0.0,
+    "tail": 0.0,
+    # Fraction of calls answered with an error; rate_limit_share of those are 429s, the rest 500s
+    "error_rate": 0.0,
+    "rate_limit_share": 0.5,
+    # Streams send their first chunk after this fraction of the sampled latency
+    "first_chunk": 0.2,
+    "stream_chunks": 20,
+}
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+# model -> settings overriding those of "*", which override DEFAULTS
+models: Dict[str, Dict] = {"*": {}}
+calls: Dict[str, Dict[str, int]] = {}
+rng = random.Random()
+
+
+def settings_for(model: str) -> Dict:
+    return {**DEFAULTS, **models["*"], **models.get(model, {})}
+
+
+def parse_latency(spec: str):
+    """MODEL=BASE[,TAIL_PROB,TAIL] -> (model, settings)"""
+    model, _, values = spec.partition("=")
+    parts = [float(v) for v in values.split(",")]
+    base = parts[0]
+    tail_probability = parts[1] if len(parts) > 1 else 0.0
+    tail = parts[2] if len(parts) > 2 else base
+    return model, {"distribution": "fixed", "params": [base], "tail_probability": tail_probability, "tail": tail}
+
+
+def parse_distribution(spec: str):
+    """MODEL=KIND:A[:B] -> (model, settings)"""
+    model, _, values = spec.partition("=")
+    kind, *params = values.split(":")
+    if kind not in DISTRIBUTIONS:
+        raise SystemExit(f"Unknown distribution '{kind}' (expected one of: {', '.join(DISTRIBUTIONS)})")
+    return model, {"distribution": kind, "params": [float(p) for p in params]}
+
+
+def parse_errors(spec: str):
+    """MODEL=RATE[,SHARE_429] -> (model, settings)"""
+    model, _, values = spec.partition("=")
+    parts = [float(v) for v in values.split(",")]
+    settings = {"error_rate": parts[0]}
+    if len(parts) > 1:
+        settings["rate_limit_share"] = parts[1]
+    return model, settings
+
+
+def configure(model: str, settings: Dict) -> Dict:
+    models.setdefault(model, {}).update(settings)
+    return settings_for(model)
+
+
+def delay_for(model: str) -> float:
+    settings = settings_for(model)
+    if rng.random() < settings["tail_probability"]:
+        return settings["tail"]
+    kind, params = settings["distribution"], settings["params"]
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        return params[0] * math.exp(rng.gauss(0.0, params[1]))
+    if kind == "exponential":
+        return rng.expovariate(1.0 / params[0])
+    return params[0]
+
+
+def count(model: str, outcome: str) -> None:
+    stats = calls.setdefault(model, {"requests": 0, "streams": 0, "errors_429": 0, "errors_500": 0})
+    stats[outcome] += 1
+
+
+def injected_error(model: str):
+    """An error response for this call, or None"""
+    settings = settings_for(model)
+    if rng.random() >= settings["error_rate"]:
+        return None
+    if rng.random() < settings["rate_limit_share"]:
+        count(model, "errors_429")
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"code": 429, "message": "Rate limit exceeded (fake)"}},
+            headers={"Retry-After": "1"},
+        )
+    count(model, "errors_500")
+    return JSONResponse(status_code=500, content={"error": {"code": 500, "message": "Upstream error (fake)"}})
+
+
+def usage_for(prompt: str, text: str) -> Dict[str, int]:
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(text)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+async def sse_events(model: str, prompt: str, text: str, delay: float):
+    settings = settings_for(model)
+    completion_id = f"fake-{time.time_ns()}"
+    words = text.split(" ")
+    size = max(1, math.ceil(len(words) / max(1, int(settings["stream_chunks"]))))
+    pieces = [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+    # First chunk after part of the latency, the rest spread evenly like tokens arriving
+    await asyncio.sleep(delay * settings["first_chunk"])
+    gap = delay * (1 - settings["first_chunk"]) / max(1, len(pieces) - 1)
+    yield ": OPENROUTER PROCESSING\n\n"
+    for i, piece in enumerate(pieces):
+        if i:
+            await asyncio.sleep(gap)
+        chunk = {
+            "id": completion_id,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": piece if i == 0 else " " + piece}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    final = {"id": completion_id, "model": model, "choices": [], "usage": usage_for(prompt, text)}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "unknown")
+    prompt = body["messages"][-1]["content"]
+    count(model, "requests")
+
+    delay = delay_for(model)
+    error = injected_error(model)
+    if error is not None:
+        # Errors come back after a fraction of the usual latency
+        await asyncio.sleep(delay * settings_for(model)["first_chunk"])
+        return error
+
+    text = local_completion(prompt, body.get("max_tokens"))
+    if body.get("stream"):
+        count(model, "streams")
+        return StreamingResponse(sse_events(model, prompt, text, delay), media_type="text/event-stream")
+
+    await asyncio.sleep(delay)
+    return {
+        "id": f"fake-{time.time_ns()}",
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop"
+        }],
+        "usage": usage_for(prompt, text),
+    }
+
+
+@app.post("/_control/model")
+@app.post("/_control/latency")
+async def set_model(settings: Dict):
+    model = settings.pop("model", "*")
+    if "base" in settings:
+        # Older form: {"base": 0.05, "tail_probability": ..., "tail": ...}
+        settings["distribution"] = "fixed"
+        settings["params"] = [float(settings.pop("base"))]
+    return configure(model, settings)
+
+
+@app.get("/_control/stats")
+async def stats():
+    return {"models": {model: settings_for(model) for model in models}, "calls": calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenRouter server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", action="append", default=[], metavar="MODEL=BASE[,TAIL_PROB,TAIL]")
+    parser.add_argument("--distribution", action="append", default=[], metavar="MODEL=KIND:A[:B]")
+    parser.add_argument("--errors", action="append", default=[], metavar="MODEL=RATE[,SHARE_429]")
+    parser.add_argument("--seed", type=int, default=None, help="seed latency and error sampling")
+    args = parser.parse_args()
+
+    rng.seed(args.seed)
+    for parse, specs in ((parse_latency, args.latency), (parse_distribution, args.distribution), (parse_errors, args.errors)):
+        for spec in specs:
+            configure(*parse(spec))
+
+    print(f"🧪 Fake OpenRouter on http://{args.host}:{args.port}/api/v1")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+End-to-end load test
+Drives the full user flow (register, login, create project, AI outline,
+generate, refine, export) against a running backend at a target request
+rate and reports throughput plus p50/p95/p99 latency per endpoint.
+
+Flows start at a fixed pace (open loop), so a slow server shows up as rising
+latency and a growing number of flows in flight, not as a lower offered load.
+
+Run the backend without spending API credits, with the local LLM backend:
+    LLM_BACKEND=local LOCAL_LLM_LATENCY=0.5 python run.py
+or against the fake OpenRouter server (real client path: timeouts, retries, hedging):
+    python fake_openrouter.py --distribution "*=lognormal:0.8:0.6" --errors "*=0.01"
+    OPENROUTER_BASE_URL=http://127.0.0.1:8900/api/v1 OPENROUTER_API_KEY=fake python run.py
+
+Run from the backend directory:
+    python load_test.py [--url http://localhost:8000] [--rps 5] [--duration 60]
+                        [--doc-type docx|pptx] [--topics N] [--stream]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import httpx
+
+ENDPOINTS = ["register", "login", "create_project", "ai_outline", "generate", "refine", "export"]
+TOPICS = [
+    "Renewable energy adoption", "Remote work culture", "Supply chain resilience", "Urban cycling",
+    "Ocean plastic", "Small business marketing", "Cloud cost control", "Microlearning",
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Recorder:
+    """Latency samples and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Counter] = defaultdict(Counter)
+        self.statuses: Counter = Counter()
+        self.requests = 0
+
+    def record(self, endpoint: str, seconds: float, status: str, ok: bool) -> None:
+        self.requests += 1
+        self.latencies[endpoint].append(seconds)
+        self.statuses[status] += 1
+        if not ok:
+            self.errors[endpoint][status] += 1
+
+    def sample(self, name: str, seconds: float) -> None:
+        """A latency that is not a request of its own (e.g. time to first chunk)"""
+        self.latencies[name].append(seconds)
+
+    @property
+    def failed(self) -> int:
+        return sum(sum(errors.values()) for errors in self.errors.values())
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.recorder = Recorder()
+        self.run_id = uuid.uuid4().hex[:8]
+        self.started = 0
+        self.completed = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, path: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(e).__name__, ok=False)
+            raise FlowFailed(endpoint)
+        ok = response.status_code < 400
+        self.recorder.record(endpoint, time.perf_counter() - started, str(response.status_code), ok)
+        if not ok:
+            raise FlowFailed(endpoint)
+        return response
+
+    async def call_stream(self, client: httpx.AsyncClient, endpoint: str, path: str, **kwargs) -> None:
+        """Streamed refine: time to the first chunk is recorded separately"""
+        started = time.perf_counter()
+        first = None
+        try:
+            async with client.stream("POST", path, **kwargs) as response:
+                async for _ in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter() - started
+        except httpx.HTTPError as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(e).__name__, ok=False)
+            raise FlowFailed(endpoint)
+        ok = response.status_code < 400
+        self.recorder.record(endpoint, time.perf_counter() - started, str(response.status_code), ok)
+        if first is not None and ok:
+            self.recorder.sample(f"{endpoint}_first_chunk", first)
+        if not ok:
+            raise FlowFailed(endpoint)
+
+    def topic(self, i: int) -> str:
+        # --topics N reuses N topics, so LLM cache hits can be part of the mix
+        if self.args.topics:
+            return TOPICS[i % min(self.args.topics, len(TOPICS))]
+        return f"{TOPICS[i % len(TOPICS)]} ({self.run_id}-{i})"
+
+    async def flow(self, client: httpx.AsyncClient, i: int) -> None:
+        doc_type = self.args.doc_type
+        email = f"load-{self.run_id}-{i}@Example.com"
+        password = "load-test-password"
+        try:
+            await self.call(client, "register", "POST", "/auth/register",
+                            json={"full_name": f"Load Test {i}", "email": email, "password": password})
+            response = await self.call(client, "login", "POST", "/auth/login",
+                                       json={"email": email, "password": password})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            response = await self.call(client, "create_project", "POST", "/projects/", headers=headers,
+                                       json={"title": f"Load test {i}", "doc_type": doc_type})
+            project_id = response.json()["id"]
+
+            response = await self.call(client, "ai_outline", "POST", f"/projects/{project_id}/ai-outline", headers=headers,
+                                       json={"topic": self.topic(i), "doc_type": doc_type})
+            section_id = response.json()["outline"][0]["id"]
+
+            await self.call(client, "generate", "POST", f"/projects/{project_id}/generate", headers=headers)
+
+            refine = {"section_id": section_id, "refinement_prompt": "Make it more concise"}
+            if self.args.stream:
+                await self.call_stream(client, "refine_stream", f"/projects/{project_id}/refine/stream",
+                                       headers=headers, json=refine)
+            else:
+                await self.call(client, "refine", "POST", f"/projects/{project_id}/refine", headers=headers, json=refine)
+
+            await self.call(client, "export", "GET", f"/projects/{project_id}/export/{doc_type}", headers=headers)
+            self.completed += 1
+        except FlowFailed:
+            pass
+        finally:
+            self.in_flight -= 1
+
+    async def run(self) -> float:
+        args = self.args
+        # Every flow makes len(ENDPOINTS) requests; pace flow starts to hit the target request rate
+        interval = len(ENDPOINTS) / args.rps
+        limits = httpx.Limits(max_connections=args.max_flows, max_keepalive_connections=args.max_flows)
+        timeout = httpx.Timeout(args.timeout)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+            tasks = []
+            started = time.perf_counter()
+            next_start = started
+            while time.perf_counter() - started < args.duration:
+                if self.in_flight >= args.max_flows:
+                    # The server is not keeping up; count the flow instead of queueing it
+                    self.dropped += 1
+                else:
+                    self.in_flight += 1
+                    self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                    tasks.append(asyncio.create_task(self.flow(client, self.started)))
+                    self.started += 1
+                next_start += interval
+                await asyncio.sleep(max(0.0, next_start - time.perf_counter()))
+
+            print(f"⏳ Waiting for {self.in_flight} flows in flight...")
+            done, pending = await asyncio.wait(tasks, timeout=args.drain) if tasks else (set(), set())
+            for task in pending:
+                task.cancel()
+            return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> bool:
+        recorder = self.recorder
+        print("=" * 60)
+        print(f"📊 Results: {elapsed:.1f} s, target {self.args.rps:g} req/s, {self.args.doc_type}")
+        print("=" * 60)
+        print(f"{'endpoint':<26}{'count':>6}{'err':>5}{'req/s':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        names = [name for name in ENDPOINTS if name in recorder.latencies]
+        names += sorted(name for name in recorder.latencies if name not in ENDPOINTS)
+        for name in names:
+            samples = recorder.latencies[name]
+            print(
+                f"{name:<26}{len(samples):>6}{sum(recorder.errors[name].values()):>5}"
+                f"{len(samples) / elapsed:>7.2f}"
+                f"{percentile(samples, 50) * 1000:>9.0f}"
+                f"{percentile(samples, 95) * 1000:>9.0f}"
+                f"{percentile(samples, 99) * 1000:>9.0f}"
+            )
+        print("-" * 60)
+        print(f"throughput: {recorder.requests / elapsed:.2f} req/s ({recorder.requests} requests)")
+        print(f"flows: {self.completed}/{self.started} completed, {self.dropped} dropped, peak {self.peak_in_flight} in flight")
+        print(f"status codes: {dict(sorted(recorder.statuses.items()))}")
+        for name, errors in recorder.errors.items():
+            if errors:
+                print(f"   ❌ {name}: {dict(errors)}")
+
+        error_rate = recorder.failed / max(1, recorder.requests)
+        ok = error_rate <= self.args.max_error_rate and self.dropped == 0
+        print(f"{'✅' if ok else '❌'} error rate {error_rate:.2%} (limit {self.args.max_error_rate:.2%})")
+        return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load test for the document generator API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=5, help="target requests per second across all endpoints")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to keep starting new flows")
+    parser.add_argument("--doc-type", choices=["docx", "pptx"], default="docx")
+    parser.add_argument("--topics", type=int, default=0, help="reuse this many topics (0: a new topic per flow)")
+    parser.add_argument("--stream", action="store_true", help="refine through the streaming endpoint")
+    parser.add_argument("--max-flows", type=int, default=200, help="flows in flight before new ones are dropped")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--drain", type=float, default=180, help="seconds to wait for flows in flight at the end")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    try:
+        httpx.get(f"{args.url}/health", timeout=5).raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"❌ Backend not reachable at {args.url}: {e}")
+        print("💡 Start it first, e.g. LLM_BACKEND=local python run.py")
+        return 1
+
+    print("=" * 60)
+    print(f"🚦 Load test: {args.url}, {args.rps:g} req/s for {args.duration:g} s")
+    print("=" * 60)
+    test = LoadTest(args)
+    elapsed = asyncio.run(test.run())
+    return 0 if test.report(elapsed) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -38,7 +38,9 @@ export default function ProjectEditor() {
     const generateContent = async () => {
         setGenerating(true);
         try {
-            await API.post(`/projects/${id}/generate`);
+            // Regenerating should produce fresh text rather than a cached answer
+            const regenerate = Object.keys(project?.content || {}).length > 0;
+            await API.post(`/projects/${id}/generate`, null, { params: { no_cache: regenerate } });
             await loadProject();
             alert("Content generated successfully!");
         } catch (err) {